@@ -8,34 +8,334 @@ state of health (SoH) and historical data for analytics and visualization.
 API Endpoints:
   - GET /: Health check endpoint.
   - GET /status/latest: Returns the most recent battery health record.
-  - GET /history: Returns all historical health records for time-series analysis.
+  - GET /history: Returns historical health records (paginated) for time-series analysis.
+  - GET /forecast: Returns the remaining useful life forecast.
+  - GET /dashboard/bundle: Returns everything the dashboard renders in one response.
+  - GET /pool-health: Returns database connection pool utilization.
 
 Dependencies:
   - FastAPI: Web framework for building the REST API.
   - Uvicorn: ASGI server to run the FastAPI application.
   - sqlite3: Standard library for SQLite database access.
-  - pandas: Data manipulation and SQL query results handling.
+  - orjson: Fast JSON encoding of the cached responses.
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager, contextmanager
+from collections import OrderedDict
+from fastapi import FastAPI, Query, Request, Response
 import uvicorn
+import orjson
+import queue
 import sqlite3
-import pandas as pd
+import threading
+import time
 
-app = FastAPI(title="Battery Digital Twin API")
+# Path to the battery health database written by cloud_listener.py
+DB_PATH = "data/databank/battery_data.db"
 
+# Connection pool bounds (read-only connections)
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
 
-def get_db_connection():
+# Connection tuning: the larger page cache / mmap window stays warm because
+# pooled connections are reused across requests.
+DB_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",  # 64 MB page cache
+    "PRAGMA mmap_size=268435456",  # 256 MB memory-mapped I/O
+)
+
+# /history page size (records per request)
+HISTORY_DEFAULT_LIMIT = 1000
+HISTORY_MAX_LIMIT = 10000
+
+# Fields returned for each /history record
+HISTORY_FIELDS = ("cycle_id", "soh", "avg_resistance", "timestamp")
+
+# Number of most recent records included in /dashboard/bundle, and the chart
+# columns returned for them
+BUNDLE_HISTORY_LIMIT = 1000
+BUNDLE_HISTORY_FIELDS = ("cycle_id", "soh", "avg_resistance")
+
+# SoH thresholds of the battery status classification (percent)
+HEALTHY_SOH = 90
+CRITICAL_SOH = 80
+
+# Prepared statements kept per connection. Pooled connections are reused, so
+# the hot queries below are parsed and planned once per connection.
+STATEMENT_CACHE_SIZE = 128
+
+# Newest health record: the last inserted row, read with a backwards seek on
+# the primary key (timestamps have one-second resolution, so several cycles
+# stored in the same second would tie)
+LATEST_SQL = (
+    "SELECT cycle_id, soh, avg_resistance, timestamp FROM health_history "
+    "ORDER BY id DESC LIMIT 1"
+)
+
+# One /history page: keyset range seek on the primary key (cursor, limit)
+HISTORY_PAGE_SQL = (
+    "SELECT id, cycle_id, soh, avg_resistance, timestamp FROM health_history "
+    "WHERE id > ? ORDER BY id LIMIT ?"
+)
+
+# Most recent records in insertion order: range seek backwards on the primary
+# key, re-sorted ascending for the chart
+HISTORY_TAIL_SQL = (
+    "SELECT cycle_id, soh, avg_resistance FROM ("
+    "SELECT id, cycle_id, soh, avg_resistance FROM health_history "
+    "ORDER BY id DESC LIMIT ?) ORDER BY id"
+)
+
+# Least-squares fit of SoH over cycle_id computed by SQLite in one pass:
+# slope = cov(cycle, soh) / var(cycle). NULLIF yields NULL when all rows
+# share one cycle_id and no trend can be fitted. The forecast starts from the
+# newest record (last inserted row, as for /status/latest), not the highest
+# cycle_id, which can belong to an older run.
+FORECAST_SQL = """
+    SELECT
+        COUNT(*),
+        (SELECT cycle_id FROM health_history ORDER BY id DESC LIMIT 1),
+        (AVG(cycle_id * soh) - AVG(cycle_id) * AVG(soh))
+            / NULLIF(AVG(cycle_id * cycle_id) - AVG(cycle_id) * AVG(cycle_id), 0),
+        (SELECT soh FROM health_history ORDER BY id DESC LIMIT 1)
+    FROM health_history
+"""
+
+# Index maintenance at startup. The newest-row and history queries seek on
+# the primary key and the forecast scans the whole table, so health_history
+# needs no secondary index. Indexes created by earlier versions of this server
+# are dropped, so cloud_listener.py inserts no longer pay for maintaining them.
+INDEX_STATEMENTS = (
+    "DROP INDEX IF EXISTS idx_health_history_timestamp",
+    "DROP INDEX IF EXISTS idx_health_history_cycle",
+)
+
+
+class ConnectionPool:
     """
-    Establish and return a connection to the battery health SQLite database.
+    Bounded SQLite connection pool with one writer and many readers.
+
+    Read-only connections are kept in a queue and handed out per request; the
+    pool grows on demand up to max_size and blocks callers beyond that. A single
+    read-write connection switches the database to WAL mode so readers never
+    block the cloud_listener.py writer, and is reserved for future writes.
+    """
+
+    def __init__(self, db_path, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE):
+        self.db_path = db_path
+        self.max_size = max_size
+        self._idle = queue.Queue(maxsize=max_size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._active = 0
+        self._waits = 0
+        self._wait_total_s = 0.0
+
+        # Open the writer first so WAL is enabled before any reader attaches
+        self.writer = self._open(read_only=False)
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer_lock = threading.Lock()
+
+        for _ in range(min_size):
+            self._created += 1
+            self._idle.put(self._open(read_only=True))
+
+    def _open(self, read_only):
+        """
+        Open a tuned connection to the battery health database.
+
+        Args:
+            read_only (bool): Open the database file in read-only mode.
+
+        Returns:
+            sqlite3.Connection: A database connection with row_factory configured
+                              to return rows as dictionaries with column names.
+        """
+        if read_only:
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                isolation_level=None,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+        conn.row_factory = sqlite3.Row  # Enable column name access in results
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def get_connection(self):
+        """
+        Borrow a read-only connection for the duration of a with-block.
+
+        Yields:
+            sqlite3.Connection: A pooled read-only connection.
+        """
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_grow = self._created < self.max_size
+                if can_grow:
+                    self._created += 1
+            if can_grow:
+                try:
+                    conn = self._open(read_only=True)
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Pool exhausted: wait for another request to return one
+                conn = self._idle.get()
+
+        with self._lock:
+            self._active += 1
+            self._waits += 1
+            self._wait_total_s += time.perf_counter() - start
+
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._active -= 1
+            self._idle.put(conn)
+
+    @contextmanager
+    def get_writer(self):
+        """
+        Borrow the single read-write connection for the duration of a with-block.
+
+        Yields:
+            sqlite3.Connection: The read-write connection.
+        """
+        with self.writer_lock:
+            yield self.writer
+
+    def stats(self):
+        """
+        Report pool utilization.
+
+        Returns:
+            dict: Active and idle connection counts and the average time callers
+                  waited to obtain a connection, in milliseconds.
+        """
+        with self._lock:
+            avg_wait_s = self._wait_total_s / self._waits if self._waits else 0.0
+            return {
+                "active_connections": self._active,
+                "idle_connections": self._idle.qsize(),
+                "total_connections": self._created,
+                "max_connections": self.max_size,
+                "average_wait_time_ms": round(avg_wait_s * 1000, 3),
+            }
+
+
+# Shared by all requests. Opening a new connection per request re-reads the
+# schema and starts with a cold page cache every time.
+pool = ConnectionPool(DB_PATH)
+
+
+def create_indexes():
+    """
+    Bring the health_history indexes up to date (see INDEX_STATEMENTS).
+
+    If the database cannot be changed (e.g., it is locked by a writer), the
+    maintenance is skipped until the next server start.
+    """
+    with pool.get_writer() as conn:
+        try:
+            for statement in INDEX_STATEMENTS:
+                conn.execute(statement)
+        except sqlite3.OperationalError as e:
+            print(f"Skipping index maintenance: {e}")
+
+
+# ============================================================================
+# Response Cache
+# ============================================================================
+
+# health_history only changes when cloud_listener.py logs a cycle, so the
+# encoded /history and /forecast responses are reused until a write lands.
+# PRAGMA data_version is an O(1) counter that changes whenever another
+# connection commits to the database file. Its value is only meaningful for
+# the connection it is read on, so it is always read on the pool's writer.
+CACHE_KEY_SQL = "PRAGMA data_version"
+
+# data_version restarts with every connection, so ETags also carry the server
+# start time; otherwise a restarted server could accept a stale client ETag.
+CACHE_EPOCH = time.time_ns()
+
+# Cache slot -> (cache key, encoded JSON body, extra headers), least recently
+# used first. Bounded because every /history page is its own slot. Per-process;
+# each Uvicorn worker keeps its own copy.
+RESPONSE_CACHE_SIZE = 32
+response_cache = OrderedDict()
+response_cache_lock = threading.Lock()
+
+
+def cached_json_response(name, request, compute):
+    """
+    Serve a JSON response from the cache, with ETag / If-None-Match support.
+
+    Args:
+        name (str): Cache slot for the endpoint and its query parameters.
+        request (Request): Incoming request, checked for an If-None-Match header.
+        compute (callable): Builds (payload, extra headers) on a cache miss.
 
     Returns:
-        sqlite3.Connection: A database connection with row_factory configured
-                          to return rows as dictionaries with column names.
+        Response: 304 Not Modified if the client's ETag is current, otherwise
+                  the cached or freshly encoded JSON body with its ETag.
     """
-    conn = sqlite3.connect("data/databank/battery_data.db")
-    conn.row_factory = sqlite3.Row  # Enable column name access in results
-    return conn
+    with pool.get_writer() as conn:
+        key = conn.execute(CACHE_KEY_SQL).fetchone()[0]
+    etag = f'"{name}-{CACHE_EPOCH:x}-{key}"'
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    with response_cache_lock:
+        cached = response_cache.get(name)
+        if cached is not None:
+            response_cache.move_to_end(name)
+
+    if cached is not None and cached[0] == key:
+        _, body, headers = cached
+    else:
+        payload, headers = compute()
+        body = orjson.dumps(payload)
+        with response_cache_lock:
+            response_cache[name] = (key, body, headers)
+            response_cache.move_to_end(name)
+            if len(response_cache) > RESPONSE_CACHE_SIZE:
+                response_cache.popitem(last=False)
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, **headers},
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run one-time database setup when the server starts."""
+    create_indexes()
+    yield
+
+
+app = FastAPI(title="Battery Digital Twin API", lifespan=lifespan)
 
 
 @app.get("/")
@@ -49,22 +349,32 @@ def read_root():
     return {"status": "Online", "message": "Battery Digital Twin API is running"}
 
 
+@app.get("/pool-health")
+def get_pool_health():
+    """
+    Report database connection pool utilization.
+
+    Returns:
+        dict: Active/idle connection counts and average connection wait time.
+    """
+    return pool.stats()
+
+
 @app.get("/status/latest")
 def get_latest_status():
     """
     Retrieve the most recent battery health record.
 
-    Queries the health_history table and returns the latest state of health (SoH),
-    capacity, average resistance, and timestamp.
+    Queries the health_history table and returns the latest cycle, state of
+    health (SoH), average resistance, and timestamp.
 
     Returns:
         dict: The latest health record, or an error message if no data is available.
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM health_history ORDER BY timestamp DESC LIMIT 1")
-    row = cursor.fetchone()
-    conn.close()
+    with pool.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(LATEST_SQL)
+        row = cursor.fetchone()
 
     if row:
         return dict(row)
@@ -72,44 +382,90 @@ def get_latest_status():
 
 
 @app.get("/history")
-def get_history():
+def get_history(
+    request: Request,
+    limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+    after_id: int | None = None,
+):
     """
-    Retrieve all historical battery health records.
+    Retrieve historical battery health records, one page at a time.
 
-    Fetches the complete health history from the database and returns it as a list
-    of dictionaries. Intended for time-series visualization and analytics.
+    Fetches the health history in insertion order and returns it as a list of
+    dictionaries. Intended for time-series visualization and analytics.
+    Pages are bounded by `limit`; when more records follow, the X-Next-Cursor
+    response header carries the value to pass as `after_id` for the next page.
+    Responses are cached and carry an ETag until a new cycle is logged.
+
+    Args:
+        limit (int): Maximum number of records to return.
+        after_id (int | None): Return only records logged after this cursor.
 
     Returns:
         list[dict]: A list of health records containing cycle_id, soh, avg_resistance,
                    and timestamp for each recorded measurement.
     """
-    conn = get_db_connection()
-    df = pd.read_sql_query(
-        "SELECT cycle_id, soh, avg_resistance, timestamp FROM health_history", conn
+    return cached_json_response(
+        f"history-{limit}-{after_id}",
+        request,
+        lambda: load_history(limit, after_id),
     )
-    conn.close()
-    return df.to_dict(orient="records")
+
+
+def load_history(limit, after_id):
+    """
+    Read one page of the health history.
+
+    Keyset pagination on the integer primary key: each page is a range seek on
+    the table's B-tree, however deep into the history it starts.
+
+    Returns:
+        tuple: (list of record dicts, extra headers with the next-page cursor)
+    """
+    with pool.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            HISTORY_PAGE_SQL,
+            (after_id if after_id is not None else -1, limit),
+        )
+        rows = cursor.fetchall()
+
+    records = [dict(zip(HISTORY_FIELDS, row[1:])) for row in rows]
+    headers = {"X-Next-Cursor": str(rows[-1][0])} if len(rows) == limit else {}
+    return records, headers
 
 
 @app.get("/forecast")
-def get_rul_forecast():
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT cycle_id, soh FROM health_history", conn)
-    conn.close()
+def get_rul_forecast(request: Request):
+    """
+    Forecast the remaining useful life (RUL) until the battery reaches 80% SoH.
 
-    if len(df) < 5:  # need at least some data points to calculate a trend
-        return {"error": "not enough data for forecast"}
+    Responses are cached and carry an ETag until a new cycle is logged.
 
-    # linear regression: how much SoH degrades per cycle?
-    # compare first and last SoH to get an average degradation rate per cycle, then extrapolate to 80% SoH
-    first_soh = df["soh"].iloc[0]
-    last_soh = df["soh"].iloc[-1]
-    total_cycles = df["cycle_id"].iloc[-1] - df["cycle_id"].iloc[0]
+    Returns:
+        dict: Degradation rate per cycle, remaining cycles and estimated end
+              cycle, or an error message if there is not enough data.
+    """
+    return cached_json_response(
+        "forecast", request, lambda: (compute_rul_forecast(), {})
+    )
+
+
+def compute_rul_forecast():
+    """Fit the SoH trend and extrapolate it to the 80% SoH threshold."""
+    with pool.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(FORECAST_SQL)
+        row_count, last_cycle, slope, last_soh = cursor.fetchone()
 
-    if total_cycles == 0:
+    if row_count < 5:  # need at least some data points to calculate a trend
+        return {"error": "not enough data for forecast"}
+
+    if slope is None:
         return {"error": "Berechnung noch nicht möglich"}
 
-    deg_rate = (first_soh - last_soh) / total_cycles
+    # linear regression: how much SoH degrades per cycle?
+    # the fitted slope is the average degradation rate per cycle, then extrapolate to 80% SoH
+    deg_rate = -slope
 
     if deg_rate <= 0:  # battery is "improving" according to data (measurement noise)
         return {
@@ -125,7 +481,85 @@ def get_rul_forecast():
     return {
         "deg_rate_per_cycle": round(deg_rate, 4),
         "remaining_cycles": rul_cycles,
-        "estimated_end_cycle": int(df["cycle_id"].iloc[-1] + rul_cycles),
+        "estimated_end_cycle": int(last_cycle + rul_cycles),
+    }
+
+
+@app.get("/dashboard/bundle")
+def get_dashboard_bundle(request: Request):
+    """
+    Return everything the dashboard renders in a single response.
+
+    Combines the latest record, its status classification, the RUL forecast
+    and the most recent history, so the dashboard needs one round trip per
+    refresh instead of three. Display values (SoH delta, remaining life share,
+    status) are computed here rather than in the client.
+    Responses are cached and carry an ETag until a new cycle is logged.
+
+    The history is columnar ({"cycle_id": [...], "soh": [...], ...}), so
+    the client can turn each field into an array directly instead of
+    collecting it from one object per record.
+
+    Returns:
+        dict: latest (record or None), status (or None), forecast, history.
+    """
+    return cached_json_response(
+        "dashboard-bundle", request, lambda: (build_dashboard_bundle(), {})
+    )
+
+
+def classify_status(soh):
+    """
+    Derive the dashboard's status display values from a SoH value.
+
+    Thresholds are explicit and non-overlapping:
+    - Healthy: SoH >= 90% (green)
+    - Warning: 80% < SoH < 90% (amber)
+    - Maintenance Required: SoH <= 80% (red)
+
+    Args:
+        soh (float): State of health in percent.
+
+    Returns:
+        dict: Status text and level, deviation from 100% SoH, share of the
+              usable life (100% down to 80% SoH) that remains (0 to 1), and
+              whether the SoH is critical.
+    """
+    if soh >= HEALTHY_SOH:
+        text, level = "✓ Healthy", "green"
+    elif soh > CRITICAL_SOH:
+        text, level = "⚠ Warning - Check Soon", "amber"
+    else:
+        text, level = "🚨 Maintenance Required", "red"
+
+    return {
+        "text": text,
+        "level": level,
+        "soh_delta": soh - 100,
+        "life_remaining": max(0.0, min(1.0, (soh - CRITICAL_SOH) / 20)),
+        "critical": soh <= CRITICAL_SOH,
+    }
+
+
+def build_dashboard_bundle():
+    """Read the latest record and history tail and assemble the dashboard bundle."""
+    with pool.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(LATEST_SQL)
+        row = cursor.fetchone()
+        cursor.execute(HISTORY_TAIL_SQL, (BUNDLE_HISTORY_LIMIT,))
+        rows = cursor.fetchall()
+
+    # Transpose the rows into one list per field
+    columns = zip(*rows) if rows else ((),) * len(BUNDLE_HISTORY_FIELDS)
+    history = {name: list(col) for name, col in zip(BUNDLE_HISTORY_FIELDS, columns)}
+
+    latest = dict(row) if row else None
+    return {
+        "latest": latest,
+        "status": classify_status(latest["soh"]) if latest else None,
+        "forecast": compute_rul_forecast(),
+        "history": history,
     }
 
 
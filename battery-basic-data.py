@@ -19,23 +19,39 @@ This is useful for:
 - Documentation of battery performance
 
 Dependencies:
-    - scipy: MATLAB file format (.mat) loading
+    - battery_cache: Cached loading of the MATLAB (.mat) discharge cycles
+    - numpy: Numerical arrays
     - matplotlib: Data visualization and plotting
 """
 
-import scipy.io
+import argparse
+import sys
+
+import numpy as np
+import matplotlib
+
+# Render off-screen by default so the script also runs headless (CI, pipelines);
+# the --show flag keeps matplotlib's default interactive backend instead.
+if "--show" not in sys.argv:
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 
+import battery_cache
+
+# Collapse sub-pixel line segments aggressively; the plots are screen-resolution
+# summaries, so this cuts rasterization work without visible change
+plt.rcParams["path.simplify_threshold"] = 1.0
+
 # ============================================================================
-# Global Variables
+# Configuration
 # ============================================================================
 
 # Path to battery data file
 DATA_FILE = "data/raw/B0005.mat"
 
-# Store the first discharge cycle data for use across functions
-# This is populated by load_battery_data() function
-first_discharge = None
+# Output file for the telemetry plot
+OUTPUT_PLOT = "basic/output/battery_data_B0005.png"
 
 
 # ============================================================================
@@ -45,49 +61,39 @@ first_discharge = None
 
 def load_battery_data(file_path):
     """
-    Load battery cycling data from a MATLAB file and extract the first discharge cycle.
+    Load battery cycling data and extract the first discharge cycle.
 
-    This function reads the NASA Battery Dataset in MATLAB format and locates the
-    first discharge cycle. It uses a global variable to store the result for use
-    in subsequent visualization functions.
+    This function reads the NASA Battery Dataset discharge cycles through the
+    shared .npy cache (see battery_cache.py), so the MATLAB file is only parsed
+    on the first run.
 
-    The data structure is nested in MATLAB format:
-    - mat["B0005"][0, 0]["cycle"][0] contains all cycles
-    - Each cycle has a "type" field: "discharge" or "charge"
-    - Discharge cycles contain the actual telemetry measurements
+    The cache stores all discharge cycles back to back in flat arrays:
+    - cycles["offsets"][k] is the start index of discharge cycle k
+    - The first discharge spans [offsets[0], offsets[1])
 
     Args:
         file_path (str): Path to the MATLAB file (e.g., "input/B0005.mat")
                         Expected format: NASA Battery Dataset
 
     Returns:
-        numpy.ndarray: Nested MATLAB structure containing the first discharge cycle data
-                      Access pattern: data[0, 0]["Voltage_measured"][0], etc.
+        dict: Telemetry arrays of the first discharge cycle, keyed by
+              "Voltage_measured", "Current_measured", "Temperature_measured", "Time"
 
     Note:
-        - Only the first discharge cycle is extracted (function returns after finding it)
+        - Only the first discharge cycle is extracted
         - Charge cycles are skipped
-        - The data is also stored in the global variable `first_discharge`
     """
-    # Load MATLAB file
-    mat = scipy.io.loadmat(file_path)
-
-    # Extract cycle array from nested MATLAB structure
-    # The [0, 0] indexing navigates the nested structure
-    data = mat["B0005"][0, 0]["cycle"][0]
-
-    # Declare we will use the global variable
-    global first_discharge
-
-    # Iterate through all cycles to find the first discharge
-    for entry in data:
-        # Check if this cycle is a discharge (vs. charge)
-        if entry["type"][0] == "discharge":
-            # Found the first discharge cycle, store it globally
-            first_discharge = entry["data"]
-            break
+    # Load all discharge cycles (served from the .npy cache after the first run)
+    cycles = battery_cache.load_discharge_cycles(file_path)
 
-    return first_discharge
+    # Slice the first discharge cycle out of the flat arrays
+    start, end = cycles["offsets"][0], cycles["offsets"][1]
+    return {
+        "Voltage_measured": cycles["voltage"][start:end],
+        "Current_measured": cycles["current"][start:end],
+        "Temperature_measured": cycles["temperature"][start:end],
+        "Time": cycles["time"][start:end],
+    }
 
 
 # ============================================================================
@@ -95,79 +101,71 @@ def load_battery_data(file_path):
 # ============================================================================
 
 
-def visualize_battery_data(df):
+def visualize_battery_data(time_s, voltage, temperature, out_path, show=False):
     """
-    Create and display a multi-panel visualization of battery telemetry data.
+    Create and save a multi-panel visualization of battery telemetry data.
 
     This function generates a 2-panel figure showing two key telemetry signals
     from a battery discharge cycle:
     - Top panel: Voltage over time (red line)
     - Bottom panel: Temperature over time (orange line)
 
-    The plots use global variables (time_stamps, voltage_measured, temperature_measured)
-    that should be extracted from the first_discharge data before calling this function.
-
-    The figure is saved as a PNG file for documentation and analysis purposes.
+    The figure is built through matplotlib's object API (Figure/Axes) rather
+    than pyplot's global state, so several figures can be rendered
+    independently (e.g., one per battery in worker processes).
 
     Args:
-        df: Dataframe parameter (not currently used in implementation)
-           Included for function signature compatibility
+        time_s (numpy.ndarray): Time elapsed since start of discharge (seconds)
+        voltage (numpy.ndarray): Measured voltage (Volts)
+        temperature (numpy.ndarray): Measured temperature (Celsius)
+        out_path (str): File path of the saved PNG
+        show (bool): Display the figure in an interactive window after saving
 
     Output:
         - Creates a figure with size 12x6 inches
-        - Saves the figure as "battery_data_B0005.png"
-        - Displays the figure in the interactive window
-
-    Note:
-        This function accesses global variables:
-        - time_stamps: Time array (seconds)
-        - voltage_measured: Voltage array (Volts)
-        - temperature_measured: Temperature array (Celsius)
-
-        These variables must be populated before calling this function.
+        - Saves the figure to out_path
+        - Displays the figure in the interactive window (only with show=True)
     """
-    # Create figure and set size
-    plt.figure(figsize=(12, 6))
+    # Create figure with two vertically stacked panels sharing the time axis
+    fig, (ax_voltage, ax_temp) = plt.subplots(2, 1, sharex=True, figsize=(12, 6))
 
     # ========================================================================
     # Panel 1: Voltage vs Time
     # ========================================================================
-    plt.subplot(2, 1, 1)
-
     # Plot voltage as a function of time
     # Use red color for voltage to distinguish from temperature
-    plt.plot(time_stamps, voltage_measured, color="red")
+    ax_voltage.plot(time_s, voltage, color="red")
 
     # Label the y-axis
-    plt.ylabel("Voltage (V)")
+    ax_voltage.set_ylabel("Voltage (V)")
 
     # Add informative title describing the data
-    plt.title("Details of a discharge cycle (Telemetry simulation)")
+    ax_voltage.set_title("Details of a discharge cycle (Telemetry simulation)")
 
     # ========================================================================
     # Panel 2: Temperature vs Time
     # ========================================================================
-    plt.subplot(2, 1, 2)
-
     # Plot temperature as a function of time
     # Use orange color to distinguish from voltage
-    plt.plot(time_stamps, temperature_measured, color="orange")
+    ax_temp.plot(time_s, temperature, color="orange")
 
     # Label the y-axis
-    plt.ylabel("Temperature (°C)")
+    ax_temp.set_ylabel("Temperature (°C)")
 
     # Label the x-axis (shared across both panels)
-    plt.xlabel("Time (s)")
+    ax_temp.set_xlabel("Time (s)")
 
     # ========================================================================
     # Save and Display
     # ========================================================================
 
     # Save the figure to disk as PNG for documentation
-    plt.savefig("basis/output/battery_data_B0005.png")
+    fig.savefig(out_path, dpi=100)
 
-    # Display the figure in the window
-    plt.show()
+    # Display the figure in the window if requested, then release it
+    if show:
+        plt.show()
+    plt.close(fig)
 
 
 # ============================================================================
@@ -186,32 +184,58 @@ if __name__ == "__main__":
 
     Data file: Uses B0005.mat from the NASA Battery Dataset
     Output: battery_data_B0005.png with voltage and temperature plots
+
+    Usage:
+        python battery-basic-data.py [--show]
     """
+    parser = argparse.ArgumentParser(
+        description="Visualize the first discharge cycle of battery B0005."
+    )
+    parser.add_argument(
+        "--show",
+        action="store_true",
+        help="display the plot in an interactive window after saving it",
+    )
+    args = parser.parse_args()
 
     # ========================================================================
     # Step 1: Load battery data
     # ========================================================================
     # Load the MATLAB file and extract the first discharge cycle
-    battery_data_df = load_battery_data(DATA_FILE)
+    first_discharge = load_battery_data(DATA_FILE)
 
     # ========================================================================
     # Step 2: Extract telemetry measurements
     # ========================================================================
+    # float32 is plenty for plotting at screen resolution and halves the
+    # memory traffic through matplotlib's line simplification
     # Extract voltage measurements (Volts)
-    # Access pattern: first_discharge[0, 0]["measurement_name"][0]
-    voltage_measured = first_discharge[0, 0]["Voltage_measured"][0]
+    # Access pattern: first_discharge["measurement_name"]
+    voltage_measured = first_discharge["Voltage_measured"].astype(
+        np.float32, copy=False
+    )
 
     # Extract current measurements (Amperes)
-    current_measured = first_discharge[0, 0]["Current_measured"][0]
+    current_measured = first_discharge["Current_measured"].astype(
+        np.float32, copy=False
+    )
 
     # Extract temperature measurements (Celsius)
-    temperature_measured = first_discharge[0, 0]["Temperature_measured"][0]
+    temperature_measured = first_discharge["Temperature_measured"].astype(
+        np.float32, copy=False
+    )
 
     # Extract time array (Seconds elapsed since start of discharge)
-    time_stamps = first_discharge[0, 0]["Time"][0]
+    time_stamps = first_discharge["Time"].astype(np.float32, copy=False)
 
     # ========================================================================
     # Step 3: Create visualizations
     # ========================================================================
     # Generate plots and save to disk
-    visualize_battery_data(battery_data_df)
+    visualize_battery_data(
+        time_stamps,
+        voltage_measured,
+        temperature_measured,
+        OUTPUT_PLOT,
+        show=args.show,
+    )
@@ -18,15 +18,32 @@ This analysis is useful for:
 - Validating battery health models
 
 Dependencies:
-    - scipy: MATLAB file loading (.mat format)
+    - battery_cache: Cached loading of the MATLAB (.mat) discharge cycles
+    - numpy: Numerical arrays
     - pandas: Data manipulation and analysis
     - matplotlib: Data visualization and plotting
 """
 
-import scipy.io
+import argparse
+import sys
+
+import numpy as np
 import pandas as pd
+import matplotlib
+
+# Render off-screen by default so the script also runs headless (CI, pipelines);
+# the --show flag keeps matplotlib's default interactive backend instead.
+if "--show" not in sys.argv:
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 
+import battery_cache
+
+# Collapse sub-pixel line segments aggressively; the plots are screen-resolution
+# summaries, so this cuts rasterization work without visible change
+plt.rcParams["path.simplify_threshold"] = 1.0
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -35,7 +52,7 @@ import matplotlib.pyplot as plt
 DATA_FILE = "data/raw/B0005.mat"
 
 # Output file for degradation plot
-OUTPUT_PLOT = "basis/output/battery_degradation_B0005.png"
+OUTPUT_PLOT = "basic/output/battery_degradation_B0005.png"
 
 # Figure size for plots (width, height) in inches
 FIGURE_SIZE = (10, 5)
@@ -49,10 +66,10 @@ def load_battery_data(file_path):
     """
     Load battery cycling data from a MATLAB file and extract discharge capacity.
 
-    This function reads the NASA Battery Dataset in MATLAB format and processes
-    all discharge cycles to extract capacity measurements. Each discharge cycle
-    has an associated capacity value that indicates how much charge the battery
-    can hold at that point in its life.
+    This function reads the NASA Battery Dataset discharge cycles through the
+    shared .npy cache (see battery_cache.py) to extract capacity measurements.
+    Each discharge cycle has an associated capacity value that indicates how
+    much charge the battery can hold at that point in its life.
 
     Args:
         file_path (str): Path to the MATLAB file containing battery cycling data
@@ -65,40 +82,18 @@ def load_battery_data(file_path):
 
     Note:
         - Only discharge cycles are processed; charge cycles are skipped
-        - Capacity values are extracted from the nested MATLAB structure
+        - Capacity values come from the cached per-cycle capacity array
         - The cycle numbering is relative (sequential) not absolute
     """
-    # Load the MATLAB file
-    mat = scipy.io.loadmat(file_path)
+    # Load all discharge cycles (served from the .npy cache after the first run)
+    cycles = battery_cache.load_discharge_cycles(file_path)
 
-    # Extract the cycle array from nested MATLAB structure
-    # The [0, 0] indexing navigates the nested structure
-    data = mat["B0005"][0, 0]["cycle"][0]
+    # One capacity measurement per discharge cycle
+    # (float32 is plenty for plotting and halves the data handed to matplotlib)
+    discharge_capacity = cycles["capacity"].astype(np.float32)
 
-    # Initialize lists to store extracted data
-    discharge_capacity = []  # Capacity values for each discharge
-    cycle_number = []  # Cycle counter
-
-    # ========================================================================
-    # Process each cycle in the dataset
-    # ========================================================================
-    for i in range(len(data)):
-        # Get the type of this cycle (discharge or charge)
-        cycle_type = data[i]["type"][0]
-
-        # Only process discharge cycles
-        # (Charge cycles are less useful for degradation analysis)
-        if cycle_type == "discharge":
-            # Extract the capacity measurement for this discharge
-            # Access pattern: data[i]["data"][0, 0]["Capacity"][0][0]
-            capacity = data[i]["data"][0, 0]["Capacity"][0][0]
-
-            # Store the capacity value
-            discharge_capacity.append(capacity)
-
-            # Increment the cycle counter
-            # Use length of list for sequential numbering
-            cycle_number.append(len(discharge_capacity))
+    # Sequential cycle numbering: 1, 2, 3, ...
+    cycle_number = np.arange(1, len(discharge_capacity) + 1)
 
     # ========================================================================
     # Create DataFrame from collected data
@@ -112,7 +107,7 @@ def load_battery_data(file_path):
 # ============================================================================
 
 
-def visualize_battery_degradation(df):
+def visualize_battery_degradation(df, show=False):
     """
     Analyze and visualize battery capacity degradation over discharge cycles.
 
@@ -132,10 +127,11 @@ def visualize_battery_degradation(df):
         df (pd.DataFrame): DataFrame with columns:
             - Cycle: Discharge cycle number
             - Capacity: Capacity measurement for that cycle (in Ah)
+        show (bool): Display the plot in an interactive window after saving
 
     Output:
         - Creates a plot with capacity vs cycle number
-        - Displays the plot in interactive window
+        - Displays the plot in interactive window (only with show=True)
         - Saves the plot as PNG file for documentation
         - Prints first 10 rows of the dataset to console
     """
@@ -182,8 +178,10 @@ def visualize_battery_degradation(df):
     # Save the figure to disk as PNG for documentation and sharing
     plt.savefig(OUTPUT_PLOT)
 
-    # Display the figure in the interactive window
-    plt.show()
+    # Display the figure in the interactive window if requested, then release it
+    if show:
+        plt.show()
+    plt.close()
 
 
 # ============================================================================
@@ -208,9 +206,23 @@ if __name__ == "__main__":
         - Console: First 10 rows of cycle/capacity data
         - File: battery_degradation_B0005.png (degradation plot)
         - Display: Interactive plot window showing capacity vs cycle count
+          (only with --show)
+
+    Usage:
+        python battery-degradation-basic.py [--show]
     """
+    parser = argparse.ArgumentParser(
+        description="Plot the capacity degradation of battery B0005."
+    )
+    parser.add_argument(
+        "--show",
+        action="store_true",
+        help="display the plot in an interactive window after saving it",
+    )
+    args = parser.parse_args()
+
     # Load the battery data from MATLAB file
     battery_data_df = load_battery_data(DATA_FILE)
 
     # Analyze and visualize the degradation
-    visualize_battery_degradation(battery_data_df)
+    visualize_battery_degradation(battery_data_df, show=args.show)
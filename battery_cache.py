@@ -0,0 +1,286 @@
+"""
+Battery Dataset Cache
+
+This module loads the discharge cycles of the NASA Battery Dataset (MATLAB format)
+and caches them as flat NumPy arrays (one .npy file per array), so that the
+analysis scripts and the telemetry simulator do not have to parse the MATLAB
+structure on every run.
+
+The cache stores all discharge cycles back to back in flat arrays:
+- voltage, current, temperature, time: concatenated telemetry of all discharges,
+  stored as float32 (the sensor data has far fewer significant digits)
+- offsets: start index of each discharge cycle (plus the total length at the end),
+  so cycle k spans [offsets[k], offsets[k + 1])
+- capacity: measured capacity of each discharge cycle (Ah)
+- cycle_idx: position of each discharge cycle in the original cycle array
+
+The cache is rebuilt automatically whenever the .mat file is newer than the cache.
+scipy is only imported when the cache has to be (re)built, so cache hits do not
+pay for loading it.
+
+Cached arrays are opened as read-only memory maps instead of being read into
+memory. Several processes loading the same battery (e.g., one simulated
+vehicle per process) therefore share a single copy of the data through the
+OS page cache, and pages are only read from disk when they are accessed.
+
+Dependencies:
+    - scipy: MATLAB file loading (.mat format)
+    - numpy: Array storage and the .npy cache format
+"""
+
+import functools
+import os
+
+import numpy as np
+
+# ============================================================================
+# Configuration
+# ============================================================================
+
+# Directory holding the cached arrays (one subdirectory per battery)
+CACHE_DIR = "data/cache"
+
+# Version of the cache layout, part of the directory name so that caches
+# written in an older layout are rebuilt instead of loaded
+CACHE_VERSION = 3
+
+# Arrays stored in the cache, one <name>.npy file each
+CACHE_ARRAYS = (
+    "voltage",
+    "current",
+    "temperature",
+    "time",
+    "offsets",
+    "capacity",
+    "cycle_idx",
+)
+
+# dtype of the telemetry columns
+TELEMETRY_DTYPE = np.float32
+
+# Minimum discharge current (A) for a resistance sample: below it V/I is
+# dominated by the division (near-zero current), so the sample counts as 0 Ω
+MIN_RESISTANCE_CURRENT_A = 0.01
+
+# ============================================================================
+# Cache Handling
+# ============================================================================
+
+
+def cache_path_for(file_path):
+    """
+    Return the cache directory for a MATLAB data file.
+
+    Args:
+        file_path (str): Path to the .mat file (e.g., "data/raw/B0005.mat")
+
+    Returns:
+        str: Path of the matching cache directory
+             (e.g., "data/cache/B0005_discharge_v3")
+    """
+    battery_id = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(CACHE_DIR, f"{battery_id}_discharge_v{CACHE_VERSION}")
+
+
+def save_cache(cache_path, arrays):
+    """
+    Write the flat arrays to a cache directory, one .npy file per array.
+
+    Each file is written under a temporary name and then renamed, so a
+    concurrently starting process never memory-maps a half-written array.
+
+    Args:
+        cache_path (str): Cache directory as returned by cache_path_for()
+        arrays (dict): Flat arrays as described in the module docstring
+    """
+    os.makedirs(cache_path, exist_ok=True)
+    for name in CACHE_ARRAYS:
+        array_path = os.path.join(cache_path, f"{name}.npy")
+        tmp_path = f"{array_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, arrays[name])
+        os.replace(tmp_path, array_path)
+
+
+def extract_discharge_cycles(file_path):
+    """
+    Parse a MATLAB battery file and flatten its discharge cycles.
+
+    Args:
+        file_path (str): Path to the .mat file containing battery cycling data
+
+    Returns:
+        dict: Flat arrays as described in the module docstring
+    """
+    # Imported here: only needed on a cache miss, and importing scipy.io takes
+    # longer than reading the whole cache
+    import scipy.io
+
+    battery_id = os.path.splitext(os.path.basename(file_path))[0]
+
+    # Decode only the battery struct and collapse MATLAB cells/structs into
+    # plain dicts and 1-D arrays (no [0, 0] unwrapping needed)
+    mat = scipy.io.loadmat(file_path, variable_names=[battery_id], simplify_cells=True)
+    data = mat[battery_id]["cycle"]
+
+    # Locate all discharge cycles in one vectorized comparison
+    types = np.array([entry["type"] for entry in data])
+    cycle_idx = np.flatnonzero(types == "discharge")
+    discharges = [data[idx]["data"] for idx in cycle_idx]
+
+    capacity = np.fromiter(
+        (d["Capacity"] for d in discharges),
+        dtype=np.float64,
+        count=len(discharges),
+    )
+
+    lengths = np.fromiter(
+        (d["Time"].size for d in discharges),
+        dtype=np.int64,
+        count=len(discharges),
+    )
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    def column(name):
+        return np.concatenate(
+            [d[name] for d in discharges], dtype=TELEMETRY_DTYPE, casting="same_kind"
+        )
+
+    return {
+        "voltage": column("Voltage_measured"),
+        "current": column("Current_measured"),
+        "temperature": column("Temperature_measured"),
+        "time": column("Time"),
+        "offsets": offsets,
+        "capacity": capacity,
+        "cycle_idx": cycle_idx.astype(np.int64),
+    }
+
+
+@functools.lru_cache(maxsize=2)
+def load_discharge_cycles(file_path):
+    """
+    Load the discharge cycles of a battery, using the .npy cache when possible.
+
+    On the first call (or when the .mat file changed) the MATLAB file is parsed
+    and the cache is written. Later calls memory-map the flat arrays straight
+    from the cache (read-only, shared with other processes), and repeated
+    calls within one process return the same arrays.
+
+    Args:
+        file_path (str): Path to the .mat file containing battery cycling data
+
+    Returns:
+        dict: Flat arrays as described in the module docstring
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist
+    """
+    cache_path = cache_path_for(file_path)
+    source_mtime = os.path.getmtime(file_path)
+    array_paths = {
+        name: os.path.join(cache_path, f"{name}.npy") for name in CACHE_ARRAYS
+    }
+
+    # The cache is valid if every array exists and is at least as new as the
+    # .mat file
+    if all(
+        os.path.exists(path) and os.path.getmtime(path) >= source_mtime
+        for path in array_paths.values()
+    ):
+        return {
+            name: np.load(path, mmap_mode="r") for name, path in array_paths.items()
+        }
+
+    arrays = extract_discharge_cycles(file_path)
+    save_cache(cache_path, arrays)
+    return arrays
+
+
+def split_discharge_cycles(cycles):
+    """
+    Split the flat arrays into per-cycle telemetry tuples.
+
+    The split is done once with np.split on the offsets; the returned arrays
+    are views into the flat arrays, so no telemetry is copied.
+
+    Args:
+        cycles (dict): Flat arrays as returned by load_discharge_cycles()
+
+    Returns:
+        list[tuple]: One (cycle_idx, voltage, current, temperature, time)
+                     tuple per discharge cycle, in cycle order
+    """
+    bounds = cycles["offsets"][1:-1]
+    return list(
+        zip(
+            cycles["cycle_idx"].tolist(),
+            np.split(cycles["voltage"], bounds),
+            np.split(cycles["current"], bounds),
+            np.split(cycles["temperature"], bounds),
+            np.split(cycles["time"], bounds),
+        )
+    )
+
+
+# ============================================================================
+# Cycle Features
+# ============================================================================
+
+
+def internal_resistance(voltage, current):
+    """
+    Approximate the internal resistance of each measurement as V/|I|.
+
+    Samples whose current is not significant (|I| <= MIN_RESISTANCE_CURRENT_A)
+    get a resistance of 0 to avoid division artifacts at low currents.
+
+    Args:
+        voltage (np.ndarray): Measured voltage (V)
+        current (np.ndarray): Measured current (A), sign ignored
+
+    Returns:
+        np.ndarray: Resistance per measurement (Ohms, float64)
+    """
+    current = np.abs(current, dtype=np.float64)
+    return np.divide(
+        voltage,
+        current,
+        out=np.zeros_like(current),
+        where=current > MIN_RESISTANCE_CURRENT_A,
+    )
+
+
+def cycle_features(cycles):
+    """
+    Compute the model input features of every discharge cycle.
+
+    This is the single definition of the features: the simulated vehicle
+    (battery_streamer.py) sends them and the model (train_model_rf.py) is
+    trained on them, so both must use this function.
+    All cycles are processed at once on the flat arrays: per-cycle sums are
+    taken with np.add.reduceat over the cycle start offsets (accumulated in
+    float64), so there is no Python loop over cycles.
+
+    Args:
+        cycles (dict): Flat arrays as returned by load_discharge_cycles()
+
+    Returns:
+        dict: One float64 array per feature, one value per discharge cycle:
+            - avg_resistance: Mean internal resistance, see internal_resistance() (Ohms)
+            - duration: Discharge time from first to last measurement (seconds)
+            - avg_voltage: Mean voltage during discharge (Volts)
+    """
+    offsets = cycles["offsets"]
+    starts = offsets[:-1]
+    n_samples = np.diff(offsets)
+    voltage = cycles["voltage"]
+    time_s = cycles["time"]
+
+    resistance = internal_resistance(voltage, cycles["current"])
+    return {
+        "avg_resistance": np.add.reduceat(resistance, starts) / n_samples,
+        "duration": (time_s[offsets[1:] - 1] - time_s[starts]).astype(np.float64),
+        "avg_voltage": np.add.reduceat(voltage, starts, dtype=np.float64) / n_samples,
+    }
@@ -9,22 +9,37 @@ including voltage, current, temperature, and calculated internal resistance.
 The simulator:
 1. Loads battery discharge cycle data from a .mat file
 2. Establishes a connection to an MQTT broker
-3. Streams telemetry data point-by-point to simulate real-time vehicle operation
-4. Publishes at configurable rate (default: 10 Hz)
+3. Streams telemetry data in chunks of consecutive measurements to simulate
+   real-time vehicle operation
+4. Publishes at configurable sample rate (default: 10 Hz)
+5. Publishes the model features of each completed cycle (average resistance,
+   duration, average voltage) to a separate topic
 
-This data can be consumed by digital twin backends for real-time battery health
-monitoring and prognostics.
+Each message carries up to CHUNK_SIZE measurements of one discharge cycle in
+columnar form (structure of arrays): every field is a little-endian array packed
+as raw bytes, so neither side handles individual samples in Python. Voltage,
+current and temperature are quantized to int16 counts; the "scales" map of each
+message gives the physical value of one count. Resistance and time stay float32.
+
+The raw telemetry can be consumed by monitoring clients (cloud_listener_basic.py);
+the digital twin backend (cloud_listener.py) only needs the per-cycle features.
 
 Dependencies:
-    - scipy: MATLAB file loading (.mat format)
+    - battery_cache: Cached loading of the MATLAB (.mat) discharge cycles
     - paho-mqtt: MQTT client for publishing
+    - numpy: Vectorized resistance calculation and binary telemetry columns
+    - msgpack: Compact binary (MessagePack) encoding of the telemetry payloads
 """
 
-import scipy.io
+import logging
+import os
 import time
-import json
+import msgpack
+import numpy as np
 import paho.mqtt.client as mqtt
 
+import battery_cache
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -34,6 +49,35 @@ MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 MQTT_TOPIC = "automotive/battery/telemetry"
 
+# Reconnect backoff after the broker connection was lost (seconds): the
+# delay starts at the minimum and doubles per failed attempt up to the maximum
+RECONNECT_MIN_DELAY_S = 1
+RECONNECT_MAX_DELAY_S = 30
+
+# Per-cycle model features (one small message at the end of every cycle),
+# consumed by the digital twin backend (cloud_listener.py)
+FEATURES_TOPIC = "automotive/battery/cycle_features"
+
+# Maximum number of measurements per MQTT message
+CHUNK_SIZE = 256
+
+# Wire dtype of the telemetry columns (little-endian float32)
+WIRE_DTYPE = "<f4"
+
+# Quantized columns: physical units per int16 count. Ranges in B0005 are
+# 2.4-4.3 V, 0-2.1 A and 23-42 °C, well inside the int16 range at these
+# resolutions (0.2 mV, 0.1 mA, 0.01 °C).
+QUANTIZED_DTYPE = "<i2"
+QUANTIZATION_STEPS = {
+    "voltage": 2e-4,  # max ±6.55 V
+    "current": 1e-4,  # max ±3.27 A
+    "temp": 1e-2,  # max ±327 °C
+}
+
+# Reusable MessagePack encoder for the telemetry payloads. MessagePack is a
+# binary JSON equivalent: smaller on the wire and faster to encode/decode.
+packer = msgpack.Packer(use_bin_type=True)
+
 # Data Source
 # Path to battery cycling data in MATLAB format (NASA Battery Dataset)
 FILE_NAME = "data/raw/B0005.mat"
@@ -42,6 +86,14 @@ FILE_NAME = "data/raw/B0005.mat"
 SIMULATION_RATE_HZ = 10  # Publish rate in Hz
 SIMULATION_DELAY_S = 1.0 / SIMULATION_RATE_HZ  # Delay between messages in seconds
 
+# Real-time pacing can be switched off (SDV_REALTIME=0) to replay the whole
+# dataset as fast as the broker accepts it ("backfill" mode, e.g. for testing)
+REALTIME = os.environ.get("SDV_REALTIME", "1") != "0"
+
+# Console output goes through logging with %-style arguments, so messages
+# are only formatted when their level is enabled (LOG_LEVEL, default INFO)
+log = logging.getLogger(__name__)
+
 # ============================================================================
 # Data Loading
 # ============================================================================
@@ -49,22 +101,140 @@ SIMULATION_DELAY_S = 1.0 / SIMULATION_RATE_HZ  # Delay between messages in secon
 
 def load_battery_data(file_path):
     """
-    Load battery cycling data from a MATLAB file.
+    Load the discharge cycles of a battery from a MATLAB file.
 
-    Reads the NASA Battery Dataset format (.mat file) and extracts the cycle
-    information for the specified battery (B0005).
+    Reads the NASA Battery Dataset format (.mat file) through the shared .npy
+    cache (see battery_cache.py), so the MATLAB structure is only parsed on the
+    first run.
 
     Args:
         file_path (str): Path to the .mat file containing battery data
 
     Returns:
-        numpy.ndarray: Array of cycle objects, each containing discharge/charge data
+        dict: Flat telemetry arrays of all discharge cycles; discharge cycle k
+              spans [offsets[k], offsets[k + 1]) and cycle_idx[k] is its
+              position in the original cycle array
 
     Raises:
         FileNotFoundError: If the specified file does not exist
     """
-    mat = scipy.io.loadmat(file_path)
-    return mat["B0005"][0, 0]["cycle"][0]
+    return battery_cache.load_discharge_cycles(file_path)
+
+
+# ============================================================================
+# Payload Encoding
+# ============================================================================
+
+
+def to_wire(name, column):
+    """
+    Convert a telemetry column to its wire representation.
+
+    Args:
+        name (str): Column name in the payload (e.g., "voltage")
+        column (np.ndarray): Column values in physical units
+
+    Returns:
+        np.ndarray: int16 counts for the columns in QUANTIZATION_STEPS
+                    (rounded and clipped to the int16 range), float32 otherwise
+    """
+    step = QUANTIZATION_STEPS.get(name)
+    if step is None:
+        return column.astype(WIRE_DTYPE, copy=False)
+    counts = np.clip(np.rint(column / step), -32768, 32767)
+    return counts.astype(QUANTIZED_DTYPE)
+
+
+def build_cycle_payloads(data):
+    """
+    Pre-encode the telemetry messages of every discharge cycle.
+
+    The replayed data is fixed, so every MQTT payload is computed and encoded
+    once up front; the publish loop then only hands ready-made bytes to the
+    client. Each telemetry message holds a chunk of up to CHUNK_SIZE
+    consecutive measurements as int16 / float32 columns (see to_wire()).
+    Each cycle also gets one features message with the model inputs computed
+    here from the full-resolution data.
+
+    Args:
+        data (dict): Flat discharge-cycle arrays from load_battery_data()
+
+    Returns:
+        list[tuple[int, list[tuple[int, bytes]], bytes]]:
+            (cycle_id, chunks, features message) per discharge cycle in
+            streaming order, where each chunk is
+            (number of measurements, encoded telemetry message)
+    """
+    cycles = []
+
+    # Only discharge cycles are cached
+    # (charge cycles are less useful for degradation analysis); they are
+    # pre-split into per-cycle arrays, so no offsets are handled here
+    discharges = battery_cache.split_discharge_cycles(data)
+
+    # Model features of all cycles, computed by the same function the model
+    # is trained with (train_model_rf.py)
+    features = battery_cache.cycle_features(data)
+
+    for k, (cycle_idx, voltage, current, temperature, time_s) in enumerate(discharges):
+        # Use absolute current value for resistance calculation
+        # (discharge current is negative in the dataset)
+        current = np.abs(current)  # Current in amperes
+
+        # ====================================================================
+        # Calculate internal resistance
+        # ====================================================================
+        # Internal resistance is approximated as V/I, for the whole cycle at
+        # once (samples below 10 mA count as 0 Ω, see
+        # battery_cache.internal_resistance)
+        resistance = battery_cache.internal_resistance(voltage, current)
+
+        # ====================================================================
+        # Create telemetry payloads
+        # ====================================================================
+        # Convert the columns to their wire dtype once and send slices of
+        # their raw bytes: one MessagePack message per chunk instead of per
+        # measurement
+        columns = {
+            "voltage": voltage,  # Voltage (V)
+            "current": current,  # Current (A)
+            "internal_resistance": resistance,  # Calculated R (Ω)
+            "temp": temperature,  # Temperature (°C)
+            "timestamp_s": time_s,  # Elapsed time (s)
+        }
+        columns = {name: to_wire(name, col) for name, col in columns.items()}
+
+        payloads = []
+        n_samples = len(voltage)
+        for start in range(0, n_samples, CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            payload = {
+                "cycle_id": cycle_idx,  # Which discharge cycle
+                "step": start,  # Index of the first measurement in the chunk
+                "scales": QUANTIZATION_STEPS,  # Units per count of int16 columns
+            }
+            for name, col in columns.items():
+                payload[name] = col[chunk].tobytes()
+            n_points = min(CHUNK_SIZE, n_samples - start)
+            payloads.append((n_points, packer.pack(payload)))
+
+        # ====================================================================
+        # Create cycle features payload
+        # ====================================================================
+        # The features the model was trained on (computed above with
+        # battery_cache.cycle_features), so the backend does not have to
+        # rebuild them from every telemetry sample
+        cycle_features = {
+            "cycle_id": cycle_idx,
+            "n_samples": n_samples,
+            "avg_resistance": float(features["avg_resistance"][k]),  # Ω
+            "duration": float(features["duration"][k]),  # Discharge time (s)
+            "avg_voltage": float(features["avg_voltage"][k]),  # V
+        }
+
+        cycles.append((cycle_idx, payloads, packer.pack(cycle_features)))
+
+    return cycles
 
 
 # ============================================================================
@@ -72,18 +242,96 @@ def load_battery_data(file_path):
 # ============================================================================
 
 
+def reconnect(client):
+    """
+    Re-establish a lost broker connection, retrying with exponential backoff.
+
+    Without a background network thread (loop_start) paho does not reconnect
+    by itself, so the simulator does it here. Blocks until the connection is
+    back; messages queued at the time of the loss are discarded by paho.
+
+    Args:
+        client (mqtt.Client): MQTT client whose connection was lost
+    """
+    delay = RECONNECT_MIN_DELAY_S
+    while True:
+        log.warning("Connection to broker lost, reconnecting in %d s...", delay)
+        time.sleep(delay)
+        try:
+            if client.reconnect() == mqtt.MQTT_ERR_SUCCESS:
+                log.info("Reconnected to broker %s", MQTT_BROKER)
+                return
+        except OSError as e:
+            log.warning("Reconnect failed: %s", e)
+        delay = min(2 * delay, RECONNECT_MAX_DELAY_S)
+
+
+def service_connection(client, timeout):
+    """
+    Run one iteration of the client's network loop, reconnecting on failure.
+
+    Args:
+        client (mqtt.Client): MQTT client
+        timeout (float): Maximum time to block in select() (seconds)
+
+    Returns:
+        bool: True if the connection was healthy, False if it had to be
+              re-established (queued messages were lost)
+    """
+    if client.loop(timeout=timeout) == mqtt.MQTT_ERR_SUCCESS:
+        return True
+    reconnect(client)
+    return False
+
+
+def wait_until(client, deadline):
+    """
+    Service the MQTT connection until a monotonic deadline has passed.
+
+    Replaces a plain sleep: the client's network loop blocks in select() for
+    the remaining time, so keepalive pings and incoming packets are handled
+    while waiting for the next chunk to be due. A lost connection is
+    re-established (see reconnect()) instead of spinning on the failed loop.
+
+    Args:
+        client (mqtt.Client): Connected MQTT client
+        deadline (float): time.monotonic() value to wait for
+    """
+    remaining = deadline - time.monotonic()
+    while remaining > 0:
+        service_connection(client, remaining)
+        remaining = deadline - time.monotonic()
+
+
+def drain_outgoing(client):
+    """
+    Service the MQTT connection until all queued messages have been written.
+
+    Used in backfill mode (SDV_REALTIME=0), where a whole cycle is published
+    as one burst: publish() only queues what does not fit into the socket
+    buffer, and the connection is serviced once per cycle instead of once per
+    message. Draining before the next burst keeps the outgoing queue bounded
+    to one cycle.
+
+    Args:
+        client (mqtt.Client): Connected MQTT client
+    """
+    healthy = service_connection(client, 0)
+    while healthy and client.want_write():
+        healthy = service_connection(client, 1.0)
+
+
 def run_simulator():
     """
     Run the battery telemetry simulator.
 
     This function orchestrates the entire simulation workflow:
     1. Loads battery data from file
-    2. Connects to MQTT broker
-    3. Iterates through discharge cycles
-    4. Extracts telemetry measurements (voltage, current, temperature)
-    5. Calculates internal resistance
-    6. Publishes data to MQTT topic at specified rate
-    7. Handles graceful shutdown on interruption
+    2. Pre-encodes the chunked telemetry messages of all discharge cycles
+       (voltage, current, temperature and calculated internal resistance)
+    3. Connects to MQTT broker
+    4. Publishes the messages to MQTT topic at specified rate
+    5. Handles graceful shutdown on interruption
 
     The simulator publishes only discharge cycles and skips charge cycles,
     as discharge cycles provide the most relevant degradation indicators.
@@ -93,101 +341,88 @@ def run_simulator():
         Exception: If MQTT broker connection fails
     """
     # ========================================================================
-    # Step 1: Load battery data
+    # Step 1: Load battery data and encode the messages
     # ========================================================================
     try:
         data = load_battery_data(FILE_NAME)
     except FileNotFoundError:
-        print(f"File {FILE_NAME} not found!")
+        log.error("File %s not found!", FILE_NAME)
         return
 
+    cycles = build_cycle_payloads(data)
+
     # ========================================================================
     # Step 2: Initialize MQTT client
     # ========================================================================
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, "Vehicle_Simulator_B0005")
 
+    # Never drop or block on outgoing messages while the socket is busy
+    # (0 = unbounded queue; must be set before connecting).
+    # The inflight window only applies to QoS > 0 and is left at its default.
+    client.max_queued_messages_set(0)
+
     try:
         client.connect(MQTT_BROKER, MQTT_PORT)
-        print(f"Connected to broker {MQTT_BROKER}")
+        log.info("Connected to broker %s", MQTT_BROKER)
     except Exception as e:
-        print(f"Connection to broker failed: {e}")
+        log.error("Connection to broker failed: %s", e)
         return
 
-    # Start the client background thread to handle message publishing
-    client.loop_start()
+    # The connection is opened once and reused for every message below.
+    # No background network thread (loop_start): without one, publish()
+    # writes to the socket directly instead of handing each message over to
+    # another thread, and the waits between chunks service the connection
+    # (keepalive pings, acks) via wait_until(). A lost connection is
+    # re-established there (and in drain_outgoing()) with backoff.
 
     # ========================================================================
     # Step 3: Stream discharge cycles
     # ========================================================================
     try:
-        for cycle_idx, entry in enumerate(data):
-            # Only process discharge cycles
-            # (charge cycles are less useful for degradation analysis)
-            if entry["type"][0] == "discharge":
-                # Extract telemetry arrays from the cycle data
-                # Note: Data is nested in MATLAB format [0, 0] structure
-                d = entry["data"][0, 0]
-                v_array = d["Voltage_measured"][0]  # Voltage in volts
-                i_array = d["Current_measured"][0]  # Current in amperes
-                t_array = d["Temperature_measured"][0]  # Temperature in Celsius
-                time_array = d["Time"][0]  # Time elapsed in seconds
-
-                print(f"\n--- Start cycle {cycle_idx} ---")
-
-                # Stream each telemetry point in this cycle
-                for i in range(len(v_array)):
-                    # ============================================================
-                    # Extract and process measurements
-                    # ============================================================
-                    voltage = float(v_array[i])
-
-                    # Use absolute current value for resistance calculation
-                    # (discharge current is negative in the dataset)
-                    current = abs(float(i_array[i]))
-
-                    # ============================================================
-                    # Calculate internal resistance
-                    # ============================================================
-                    # Internal resistance is approximated as V/I
-                    # Safety check: only calculate when current is significant
-                    # (> 10 mA) to avoid division artifacts at low currents
-                    if current > 0.01:
-                        resistance = voltage / current
-                    else:
-                        resistance = 0.0
-
-                    # ============================================================
-                    # Create telemetry payload
-                    # ============================================================
-                    # JSON message containing all telemetry for this measurement
-                    payload = {
-                        "cycle_id": int(cycle_idx),  # Which discharge cycle
-                        "step": int(i),  # Measurement index within cycle
-                        "voltage": voltage,  # Instantaneous voltage (V)
-                        "current": current,  # Instantaneous current (A)
-                        "internal_resistance": float(resistance),  # Calculated R (Ω)
-                        "temp": float(t_array[i]),  # Temperature (°C)
-                        "timestamp_s": float(time_array[i]),  # Elapsed time (s)
-                    }
-
-                    # ============================================================
-                    # Publish to MQTT
-                    # ============================================================
-                    json_data = json.dumps(payload)
-                    client.publish(MQTT_TOPIC, json_data)
-
-                    # Progress indicator (reduced frequency to avoid terminal spam)
-                    if i % 10 == 0:
-                        print(f"Sending point {i} for cycle {cycle_idx}...")
-
-                    # Simulate real-time streaming at specified rate (10 Hz default)
-                    time.sleep(SIMULATION_DELAY_S)
+        # Absolute send deadline of the next message. Scheduling against a
+        # monotonic clock keeps the average rate at SIMULATION_RATE_HZ even
+        # when publishing or GC pauses eat into the interval.
+        next_tick = time.monotonic()
+
+        for cycle_idx, payloads, features in cycles:
+            log.info("--- Start cycle %d ---", cycle_idx)
+
+            # Stream each pre-encoded chunk of telemetry points in this cycle
+            step = 0
+            for n_points, message in payloads:
+                info = client.publish(MQTT_TOPIC, message, qos=0, retain=False)
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    log.warning("Publish failed: %s", mqtt.error_string(info.rc))
+                log.debug(
+                    "Sending points %d-%d for cycle %d...",
+                    step,
+                    step + n_points - 1,
+                    cycle_idx,
+                )
+                step += n_points
+
+                # Simulate real-time streaming at specified rate (10 Hz default):
+                # the next chunk is due once this chunk's measurements elapsed.
+                # One wait per chunk instead of one per measurement.
+                # In backfill mode there is no wait: the cycle goes out as
+                # one burst of publish() calls on the open connection.
+                if REALTIME:
+                    next_tick += n_points * SIMULATION_DELAY_S
+                    wait_until(client, next_tick)
+
+            # Cycle complete: publish its features for the digital twin
+            info = client.publish(FEATURES_TOPIC, features, qos=0, retain=False)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                log.warning("Publish failed: %s", mqtt.error_string(info.rc))
+
+            if not REALTIME:
+                # Handle network I/O once per cycle and flush the burst
+                drain_outgoing(client)
 
     except KeyboardInterrupt:
-        print("\nSimulator stopped.")
+        log.info("Simulator stopped.")
     finally:
-        # Graceful shutdown: stop background thread and disconnect
-        client.loop_stop()
+        # Graceful shutdown: disconnect from the broker
         client.disconnect()
 
 
@@ -206,6 +441,8 @@ if __name__ == "__main__":
 
     Usage:
         python battery_streamer.py
+        SDV_REALTIME=0 python battery_streamer.py   # no pacing, replay at full speed
+        LOG_LEVEL=DEBUG python battery_streamer.py  # progress of every chunk
 
     Prerequisites:
         - MQTT broker running on localhost:1883
@@ -216,10 +453,14 @@ if __name__ == "__main__":
         Press Ctrl+C to trigger graceful shutdown
 
     Output:
-        - Streams JSON messages to MQTT topic: automotive/battery/telemetry
-        - Console output showing progress (cycle number and measurement count)
-        - Each message contains: cycle_id, step, voltage, current, internal_resistance,
-          temperature, and timestamp
+        - Streams MessagePack messages to MQTT topic: automotive/battery/telemetry
+        - Publishes one features message per cycle to MQTT topic:
+          automotive/battery/cycle_features (cycle_id, n_samples,
+          avg_resistance, duration, avg_voltage)
+        - Console output showing progress (each cycle; every chunk at DEBUG level)
+        - Each telemetry message contains: cycle_id, step (first measurement index),
+          scales and the columns voltage, current, internal_resistance, temp
+          and timestamp_s for up to CHUNK_SIZE measurements
     """
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(message)s")
     run_simulator()
-
@@ -1,30 +1,35 @@
 """
 Digital Twin Backend for Battery Health Monitoring
 
-This module implements a real-time MQTT listener that receives battery telemetry
-data from electric vehicle simulators and uses a pre-trained Random Forest model
+This module implements a real-time MQTT listener that receives battery cycle
+features from electric vehicle simulators and uses a pre-trained Random Forest model
 to predict battery capacity and State of Health (SoH).
 
 The system:
-1. Subscribes to MQTT topic for incoming battery telemetry
-2. Aggregates telemetry data for each discharge cycle
-3. Extracts features (average resistance, duration, voltage) when cycle changes
-4. Makes capacity predictions using the trained ML model
-5. Calculates and reports State of Health metrics
+1. Subscribes to MQTT topic for incoming cycle features
+2. Receives the features (average resistance, duration, voltage) of each
+   completed discharge cycle, computed by the vehicle (battery_streamer.py)
+3. Makes capacity predictions using the trained ML model
+4. Calculates and reports State of Health metrics
+
+The raw telemetry stream is not needed here; the vehicle aggregates it into one
+small features message per cycle.
 
 Dependencies:
     - paho-mqtt: MQTT client library
-    - pandas: Data frame manipulation
+    - msgpack: Decoding of the MessagePack feature messages
     - joblib: Model loading/serialization
-    - numpy: Numerical computations
+    - numpy: Feature matrices for model inference
 """
 
 import paho.mqtt.client as mqtt
-import json
-import pandas as pd
+import msgpack
 import joblib
 import numpy as np
+import queue
 import sqlite3
+import threading
+import time
 
 # ============================================================================
 # Configuration
@@ -36,7 +41,17 @@ MODEL_PATH = "data/processed/battery_model_rf.pkl"
 # MQTT Connection Settings
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
-MQTT_TOPIC = "automotive/battery/telemetry"
+MQTT_TOPIC = "automotive/battery/cycle_features"
+
+# MessagePack decoder, bound once at module scope for the per-message hot
+# path. It parses the raw payload bytes directly (no UTF-8 decode step).
+unpack_message = msgpack.unpackb
+
+# Batched inference: completed cycles are collected and predicted together,
+# either once INFERENCE_BATCH_SIZE cycles are pending or at the latest
+# INFERENCE_FLUSH_S seconds after they completed
+INFERENCE_BATCH_SIZE = 16
+INFERENCE_FLUSH_S = 0.2
 
 # Reference capacity for State of Health calculation (in Ah)
 # Assumption: A new battery has 1.85 Ah capacity
@@ -46,18 +61,86 @@ REFERENCE_CAPACITY = 1.85
 # Model Loading
 # ============================================================================
 
-# Load the pre-trained Random Forest model
+
+def compile_forest(forest):
+    """
+    Flatten a fitted random forest into NumPy arrays for fast inference.
+
+    scikit-learn's predict() has about 5 ms of fixed Python overhead per call,
+    which dominates single-row inference. Here the nodes of all trees are
+    concatenated into flat arrays and every tree is walked at once, one depth
+    level per NumPy step, giving the same predictions in tens of microseconds.
+
+    Models that are not single-output forests of decision trees (e.g. after
+    retraining with another estimator) fall back to their own predict().
+
+    Args:
+        forest: Fitted scikit-learn estimator loaded from MODEL_PATH
+
+    Returns:
+        callable: predict(features) taking an (n_samples, n_features) array
+                  and returning an (n_samples,) array of capacities (Ah)
+    """
+    estimators = getattr(forest, "estimators_", None)
+    if not estimators or any(
+        not hasattr(tree, "tree_") or tree.tree_.value.shape[1:] != (1, 1)
+        for tree in estimators
+    ):
+        return forest.predict
+
+    trees = [tree.tree_ for tree in estimators]
+    sizes = np.array([tree.node_count for tree in trees])
+    roots = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    left = np.concatenate([t.children_left for t in trees])
+    right = np.concatenate([t.children_right for t in trees])
+    feature = np.concatenate([t.feature for t in trees])
+    threshold = np.concatenate([t.threshold for t in trees])
+    value = np.concatenate([t.value[:, 0, 0] for t in trees])
+
+    # Re-point child indices into the flat arrays. Leaves (-1) point to
+    # themselves, so walking past the bottom of a tree keeps its leaf.
+    node_ids = np.arange(len(left))
+    is_leaf = left == -1
+    offsets = np.repeat(roots, sizes)
+    left = np.where(is_leaf, node_ids, left + offsets)
+    right = np.where(is_leaf, node_ids, right + offsets)
+    feature = np.where(is_leaf, 0, feature)
+    max_depth = max(tree.max_depth for tree in trees)
+
+    def predict(features):
+        # Trees compare float32 features, like scikit-learn does
+        X = np.asarray(features, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(roots, (len(X), len(roots)))
+        for _ in range(max_depth):
+            go_left = X[rows, feature[nodes]] <= threshold[nodes]
+            nodes = np.where(go_left, left[nodes], right[nodes])
+        # Forest prediction is the mean of the leaf values of all trees
+        return value[nodes].mean(axis=1)
+
+    return predict
+
+
+# Load the pre-trained Random Forest model and flatten it for inference
 model = joblib.load(MODEL_PATH)
+predict_capacity = compile_forest(model)
 
 # ============================================================================
 # Global Variables
 # ============================================================================
 
-# Buffer to store telemetry data for the current discharge cycle
-current_cycle_data = []
+# Raw MQTT payloads handed from the network thread to the processing worker
+message_queue = queue.Queue()
+
+# Completed cycles awaiting inference: (cycle_id, avg_res, duration, avg_v).
+# Shared between the processing worker and the flush thread.
+pending_cycles = []
+pending_lock = threading.Lock()
 
-# ID of the last processed cycle (used to detect cycle changes)
-last_cycle_id = None
+# Serializes flushes (processing worker and flush thread), so a batch is never
+# predicted and stored twice
+flush_lock = threading.Lock()
 
 
 # ============================================================================
@@ -116,103 +199,191 @@ def send_alert(soh):
 
 def on_message(client, userdata, msg):
     """
-    MQTT message callback handler for processing incoming telemetry data.
+    MQTT message callback handler for incoming cycle features.
 
-    This function is called whenever a new message arrives on the subscribed MQTT topic.
-    It aggregates telemetry points for each cycle and triggers model inference when
-    a cycle change is detected.
+    This function is called on paho's network thread whenever a new message
+    arrives on the subscribed MQTT topic. It only hands the raw payload to the
+    processing worker, so the network thread goes straight back to reading
+    the socket and is never held up by decoding, inference or database writes.
 
     Args:
         client: MQTT client instance
         userdata: User data (not used in this implementation)
-        msg: MQTT message object containing the telemetry payload
+        msg: MQTT message object containing the features payload
+    """
+    message_queue.put(msg.payload)
+
+
+def run_worker():
+    """
+    Process queued feature payloads in arrival order (background thread).
+    """
+    while True:
+        raw_payload = message_queue.get()
+        # A malformed message (or a failed flush) must not kill the worker:
+        # report it and carry on with the next payload
+        try:
+            process_payload(raw_payload)
+        except Exception as e:
+            print(f"❌ Error processing message: {e!r}")
+
+
+def process_payload(raw_payload):
+    """
+    Process the features message of one completed discharge cycle.
+
+    Message Format (MessagePack map, see battery_streamer.py):
+    {
+        "cycle_id": int,          # Discharge cycle number
+        "n_samples": int,         # Telemetry samples in the cycle
+        "avg_resistance": float,  # Average internal resistance (Ohms)
+        "duration": float,        # Discharge duration (seconds)
+        "avg_voltage": float      # Average voltage (Volts)
+    }
+
+    Args:
+        raw_payload (bytes): MessagePack-encoded cycle features
 
     Process:
-        1. Parse the incoming JSON payload
-        2. Check if cycle ID has changed (indicating end of current cycle)
-        3. If cycle changed: extract features and make predictions
-        4. Append current message to cycle buffer
-        5. Display live progress indicator
-    """
-    global last_cycle_id, current_cycle_data
-
-    # Parse incoming JSON payload
-    payload = json.loads(msg.payload.decode())
-    cycle_id = payload["cycle_id"]
-
-    # Detect cycle transition and trigger prediction
-    if last_cycle_id is not None and cycle_id != last_cycle_id:
-        if len(current_cycle_data) > 0:
-            # Convert collected data into a pandas DataFrame for easier manipulation
-            df_temp = pd.DataFrame(current_cycle_data)
-
-            # ================================================================
-            # Feature Engineering
-            # ================================================================
-            # Extract the same features used during model training
-
-            # Average internal resistance (Ohms)
-            # Lower resistance indicates healthier battery
-            avg_res = df_temp["internal_resistance"].mean()
-
-            # Average voltage (Volts)
-            # Used to characterize the battery's discharge profile
-            avg_v = df_temp["voltage"].mean()
-
-            # Discharge duration (seconds)
-            # Calculated as time from first to last measurement
-            duration = df_temp["timestamp_s"].iloc[-1] - df_temp["timestamp_s"].iloc[0]
-
-            # ================================================================
-            # Model Inference
-            # ================================================================
-            # Reshape features into 2D array required by scikit-learn
-            # Format: [[avg_resistance, duration, avg_voltage]]
-            input_features = np.array([[avg_res, duration, avg_v]])
-
-            # Get capacity prediction from the trained model (in Ah)
-            prediction = model.predict(input_features)[0]
-
-            # ================================================================
-            # Health Assessment
-            # ================================================================
-            # Calculate State of Health as percentage of reference capacity
-            soh_ai = (prediction / REFERENCE_CAPACITY) * 100
-
-            # Display diagnosis results
-            # print(f"\n--- 🔋 DIAGNOSIS COMPLETED FOR CYCLE {last_cycle_id} ---")
-            # print(f"Estimated capacity: {prediction:.4f} Ah")
-            # print(f"State of Health (SoH): {soh_ai:.2f} %")
-            # print(f"Basic features: R = {avg_res:.4f} Ω, Duration = {duration:.0f} s")
-            # print(f"----------------------------------------------------\n")
-
-            # --- Save Data in the SQLite-Databank ---
-            conn = sqlite3.connect("data/databank/battery_data.db")
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO health_history (cycle_id, soh, capacity, avg_resistance)
-                VALUES (?, ?, ?, ?)
-            """,
-                (int(last_cycle_id), float(soh_ai), float(prediction), float(avg_res)),
-            )
-            conn.commit()
-            conn.close()
-
-            print(f"✅ Cycle {last_cycle_id} saved: SoH {soh_ai:.2f}%")
-
-            # Send alert if SoH is critically low
-            send_alert(soh_ai)
-
-        # Reset buffer for next cycle
-        current_cycle_data = []
-
-    # Add current measurement to cycle buffer
-    current_cycle_data.append(payload)
-    last_cycle_id = cycle_id
-
-    # Display live progress (overwrites same line with carriage return)
-    print(f"Processing telemetry for cycle {cycle_id}", end="\r")
+        1. Parse the incoming MessagePack payload
+        2. Queue the features for batched inference
+        3. Flush the batch once it is full
+    """
+    # Parse incoming MessagePack payload
+    payload = unpack_message(raw_payload)
+
+    # ========================================================================
+    # Feature Engineering
+    # ========================================================================
+    # The vehicle sends the same features used during model training (both
+    # are computed by battery_cache.cycle_features):
+    # - Average internal resistance (Ohms): lower indicates a healthier battery
+    # - Discharge duration (seconds): time from first to last measurement
+    # - Average voltage (Volts): characterizes the discharge profile
+    features = (
+        payload["cycle_id"],
+        payload["avg_resistance"],
+        payload["duration"],
+        payload["avg_voltage"],
+    )
+
+    # Queue the features for batched inference
+    with pending_lock:
+        pending_cycles.append(features)
+        batch_full = len(pending_cycles) >= INFERENCE_BATCH_SIZE
+    if batch_full:
+        flush_pending_cycles()
+
+
+# ============================================================================
+# Batched Inference
+# ============================================================================
+
+
+def flush_pending_cycles():
+    """
+    Predict, store and report all completed cycles awaiting inference.
+
+    All pending feature rows go through the model in one call and are written
+    to the database in one transaction, so the per-call model and SQLite
+    overhead is paid once per batch instead of once per cycle.
+
+    The cycles are only removed from the pending list once the transaction
+    is committed: if inference or the database write fails (e.g., "database
+    is locked"), the exception propagates and the batch is retried by the
+    next flush.
+    """
+    with flush_lock:
+        # Snapshot of the pending cycles; more may be appended meanwhile
+        with pending_lock:
+            batch = pending_cycles[:]
+        if not batch:
+            return
+
+        rows = store_cycles(batch)
+
+        # Stored: drop the batch. Only flushes (serialized by flush_lock)
+        # remove cycles, so the batch is still at the front of the list.
+        with pending_lock:
+            del pending_cycles[: len(batch)]
+
+    for cycle_id, soh_ai, _, _ in rows:
+        print(f"✅ Cycle {cycle_id} saved: SoH {soh_ai:.2f}%")
+
+        # Send alert if SoH is critically low
+        send_alert(soh_ai)
+
+
+def store_cycles(batch):
+    """
+    Predict the capacity of a batch of cycles and store the results.
+
+    Args:
+        batch (list[tuple]): (cycle_id, avg_res, duration, avg_v) per cycle
+
+    Returns:
+        list[tuple]: Stored (cycle_id, soh, capacity, avg_resistance) rows
+
+    Raises:
+        sqlite3.Error: If the database write fails (nothing is committed)
+    """
+
+    # ========================================================================
+    # Model Inference
+    # ========================================================================
+    # Feature matrix in the training column order:
+    # [[avg_resistance, duration, avg_voltage], ...]
+    input_features = np.array([row[1:] for row in batch])
+
+    # Get capacity predictions from the trained model (in Ah)
+    predictions = predict_capacity(input_features)
+
+    # ========================================================================
+    # Health Assessment
+    # ========================================================================
+    # Calculate State of Health as percentage of reference capacity
+    soh_values = (predictions / REFERENCE_CAPACITY) * 100
+
+    # --- Save Data in the SQLite-Databank ---
+    rows = [
+        (int(cycle_id), float(soh_ai), float(prediction), float(avg_res))
+        for (cycle_id, avg_res, _, _), soh_ai, prediction in zip(
+            batch, soh_values, predictions
+        )
+    ]
+    conn = sqlite3.connect("data/databank/battery_data.db")
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(
+            """
+            INSERT INTO health_history (cycle_id, soh, capacity, avg_resistance)
+            VALUES (?, ?, ?, ?)
+        """,
+            rows,
+        )
+        conn.commit()
+    finally:
+        # Closing without commit rolls back a failed batch
+        conn.close()
+
+    return rows
+
+
+def run_flush_timer():
+    """
+    Flush pending cycles every INFERENCE_FLUSH_S seconds (background thread).
+
+    Bounds the reporting latency of a completed cycle when fewer than
+    INFERENCE_BATCH_SIZE cycles arrive, e.g. with a single vehicle.
+    """
+    while True:
+        time.sleep(INFERENCE_FLUSH_S)
+        # A failed flush keeps its rows pending; report it and retry on the
+        # next tick instead of letting the exception end this thread
+        try:
+            flush_pending_cycles()
+        except Exception as e:
+            print(f"❌ Error storing cycles (will retry): {e!r}")
 
 
 # ============================================================================
@@ -223,6 +394,11 @@ if __name__ == "__main__":
     # Initialize the SQLite database (creates table if it doesn't exist)
     init_battery_db()
 
+    # Start the message processing worker and the background flush of
+    # queued inference results
+    threading.Thread(target=run_worker, daemon=True).start()
+    threading.Thread(target=run_flush_timer, daemon=True).start()
+
     # Initialize MQTT client
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, "Digital_Twin_Backend")
 
@@ -232,7 +408,7 @@ if __name__ == "__main__":
     # Establish connection to MQTT broker
     client.connect(MQTT_BROKER, MQTT_PORT)
 
-    # Subscribe to battery telemetry topic
+    # Subscribe to battery cycle features topic
     client.subscribe(MQTT_TOPIC)
 
     # Start listening for messages
@@ -9,12 +9,12 @@ This listener is designed to work with battery_streamer.py which publishes
 telemetry data. Together, they demonstrate:
 1. Real-time data streaming from simulated vehicles
 2. MQTT pub/sub communication pattern
-3. JSON message parsing and processing
+3. MessagePack message parsing and processing
 4. Live telemetry monitoring in a cloud backend
 
 Features:
 - Subscribes to MQTT topic for battery telemetry
-- Parses JSON messages containing voltage, current, temperature, resistance
+- Parses MessagePack messages containing voltage, current, temperature, resistance
 - Displays received measurements in real-time
 - Error handling for malformed messages
 - Continuous listening loop for live monitoring
@@ -27,10 +27,16 @@ Use Cases:
 
 Dependencies:
     - paho-mqtt: MQTT client library for pub/sub messaging
+    - msgpack: Decoding of the MessagePack telemetry messages
+    - numpy: Decoding of the binary telemetry columns
 """
 
+import logging
+import os
+
 import paho.mqtt.client as mqtt
-import json
+import msgpack
+import numpy as np
 
 # ============================================================================
 # Configuration
@@ -42,74 +48,134 @@ MQTT_BROKER = "localhost"  # Broker address
 MQTT_PORT = 1883  # Standard MQTT port
 MQTT_TOPIC = "automotive/battery/telemetry"  # Topic to subscribe to
 
+# Wire dtypes of the telemetry columns (must match battery_streamer.py):
+# float32, or int16 counts for the columns listed in a message's "scales"
+WIRE_DTYPE = "<f4"
+QUANTIZED_DTYPE = "<i2"
+
+# MessagePack decoder, bound once at module scope for the per-message hot
+# path. It parses the raw payload bytes directly (no UTF-8 decode step).
+unpack_message = msgpack.unpackb
+
+# Console output goes through logging: INFO shows one line per received chunk,
+# DEBUG (LOG_LEVEL=DEBUG) additionally one line per measurement. Messages use
+# %-style arguments, so they are only formatted when their level is enabled.
+log = logging.getLogger(__name__)
+
 # ============================================================================
 # Message Handling
 # ============================================================================
 
 
+def decode_column(payload, name):
+    """
+    Decode one telemetry column of a chunk message.
+
+    Args:
+        payload (dict): Decoded MessagePack payload
+        name (str): Column name (e.g., "voltage")
+
+    Returns:
+        np.ndarray: The column's values in physical units
+    """
+    scale = payload["scales"].get(name)
+    if scale is None:
+        return np.frombuffer(payload[name], dtype=WIRE_DTYPE)
+    # Dequantize int16 counts with the scale sent by the streamer
+    return np.frombuffer(payload[name], dtype=QUANTIZED_DTYPE) * scale
+
+
 def on_message(client, userdata, message):
     """
     MQTT message callback handler for processing incoming telemetry.
 
     This function is automatically called by the MQTT client whenever a new
-    message arrives on the subscribed topic. It parses the JSON payload and
-    displays the battery telemetry data.
+    message arrives on the subscribed topic. It parses the MessagePack payload and
+    displays the battery telemetry data of every measurement in the chunk.
 
-    Message Format (JSON):
+    Message Format (MessagePack map, columns are little-endian arrays as bytes):
     {
         "cycle_id": int,              # Discharge cycle number
-        "step": int,                  # Measurement index within cycle
-        "voltage": float,             # Battery voltage (Volts)
-        "current": float,             # Discharge current (Amperes)
-        "internal_resistance": float, # Calculated resistance (Ohms)
-        "temp": float,                # Battery temperature (Celsius)
-        "timestamp_s": float          # Elapsed time (seconds)
+        "step": int,                  # Index of the first measurement in the chunk
+        "scales": dict,               # Units per count of the int16 columns
+        "voltage": bytes,             # Battery voltage (Volts)
+        "current": bytes,             # Discharge current (Amperes)
+        "internal_resistance": bytes, # Calculated resistance (Ohms)
+        "temp": bytes,                # Battery temperature (Celsius)
+        "timestamp_s": bytes          # Elapsed time (seconds)
     }
 
     Args:
         client: MQTT client instance
         userdata: User data passed to the client (unused here)
         message: MQTT message object containing:
-            - message.payload: Raw message bytes (JSON encoded)
+            - message.payload: Raw message bytes (MessagePack encoded)
             - message.topic: The topic on which message arrived
 
     Behavior:
-        - Decodes the JSON payload from bytes to string
-        - Extracts key telemetry fields
-        - Formats and displays the data to console
+        - Parses the MessagePack payload bytes
+        - Decodes (and dequantizes) the telemetry columns
+        - Logs the data to console (per chunk, per measurement at DEBUG)
         - Catches and reports any parsing errors
     """
     try:
         # ====================================================================
         # Parse incoming message
         # ====================================================================
-        # Decode the message payload from bytes to UTF-8 string
-        # then parse the JSON to get a Python dictionary
-        payload = json.loads(message.payload.decode("utf-8"))
+        # Parse the MessagePack bytes straight into a Python dictionary
+        payload = unpack_message(message.payload)
 
         # ====================================================================
         # Extract telemetry fields
         # ====================================================================
-        # Extract individual measurements from the payload dictionary
-        v = payload["voltage"]  # Voltage in Volts
-        t = payload["temp"]  # Temperature in Celsius
-        i = payload["current"]  # Current in Amperes
-        r = payload["internal_resistance"]  # Internal resistance in Ohms
+        # Decode the measurement columns from the payload dictionary
+        voltages = decode_column(payload, "voltage")  # Volts
+        temps = decode_column(payload, "temp")  # Celsius
+        currents = decode_column(payload, "current")  # Amperes
+        resistances = decode_column(payload, "internal_resistance")  # Ohms
         c_id = payload["cycle_id"]  # Cycle identifier
-        s = payload["step"]  # Measurement step/index
+        first_step = payload["step"]  # Index of the chunk's first measurement
 
         # ====================================================================
         # Display received telemetry
         # ====================================================================
-        # Print formatted telemetry data to console
+        # Log the latest measurement of the chunk to the console
         # This shows real-time battery metrics as they arrive
-        print(
-            f"RECEIVED - Cycle: {c_id} | Step: {s} | Voltage: {v:.4f}V | Temp: {t:.2f}°C | Current: {i:.4f}A | Internal Resistance: {r:.4f}Ω"
+        last_step = first_step + len(voltages) - 1
+        log.info(
+            "RECEIVED - Cycle: %d | Steps: %d-%d | Voltage: %.4fV | Temp: %.2f°C | Current: %.4fA | Internal Resistance: %.4fΩ",
+            c_id,
+            first_step,
+            last_step,
+            voltages[-1],
+            temps[-1],
+            currents[-1],
+            resistances[-1],
         )
 
+        # Every single measurement only in debug mode (skipped entirely
+        # otherwise, including the conversion of the columns)
+        if log.isEnabledFor(logging.DEBUG):
+            rows = zip(
+                voltages.tolist(),
+                temps.tolist(),
+                currents.tolist(),
+                resistances.tolist(),
+            )
+            for s, (v, t, i, r) in enumerate(rows, start=first_step):
+                log.debug(
+                    "RECEIVED - Cycle: %d | Step: %d | Voltage: %.4fV | Temp: %.2f°C | Current: %.4fA | Internal Resistance: %.4fΩ",
+                    c_id,
+                    s,
+                    v,
+                    t,
+                    i,
+                    r,
+                )
+
     except Exception as e:
         # Handle any errors in message parsing or processing
-        print(f"Error processing: {e}")
+        log.error("Error processing: %s", e)
 
 
 # ============================================================================
@@ -169,7 +235,7 @@ def run_listener():
     client.subscribe(MQTT_TOPIC)
 
     # Display startup message
-    print(f"Waiting for data on topic: {MQTT_TOPIC}...")
+    log.info("Waiting for data on topic: %s...", MQTT_TOPIC)
 
     # ========================================================================
     # Step 5: Start message receiving loop
@@ -203,6 +269,7 @@ if __name__ == "__main__":
 
     Usage:
         python cloud_listener_basic.py
+        LOG_LEVEL=DEBUG python cloud_listener_basic.py   # every measurement
 
     Output:
         - Prints received telemetry messages to console in real-time
@@ -212,4 +279,5 @@ if __name__ == "__main__":
     To stop:
         Press Ctrl+C to interrupt the listening loop
     """
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(message)s")
     run_listener()
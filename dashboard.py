@@ -5,14 +5,18 @@ This module provides a real-time Streamlit dashboard for monitoring battery heal
 from the Digital Twin backend. It displays State of Health (SoH), internal resistance trends,
 and historical data through interactive charts.
 
-The dashboard connects to the FastAPI backend (api_server.py) and auto-refreshes every
-10 seconds to display the latest battery monitoring data.
+The dashboard connects to the FastAPI backend (api_server.py) and reads everything it
+shows from a single endpoint (/dashboard/bundle). The page itself renders
+once; the live metrics and the history charts are Streamlit fragments that rerun on
+their own timers (every 5 and 30 seconds), so a refresh only re-executes and redraws
+the part of the page that shows new data.
 
 Dependencies:
   - streamlit: Web framework for interactive dashboard creation.
   - requests: HTTP client for fetching data from the FastAPI backend.
   - pandas: Data manipulation and DataFrame operations.
-  - time: Built-in module for implementing refresh intervals.
+  - numpy: Downsampling of long chart series.
+  - orjson: Fast parsing of the JSON responses.
 
 Environment:
   - API_URL: Expected to be running at http://127.0.0.1:8000
@@ -21,7 +25,8 @@ Environment:
 import streamlit as st
 import requests
 import pandas as pd
-import time
+import numpy as np
+import orjson
 
 # Configure Streamlit page settings
 st.set_page_config(page_title="Battery Digital Twin", layout="wide")
@@ -29,46 +34,227 @@ st.set_page_config(page_title="Battery Digital Twin", layout="wide")
 st.title("🔋 Battery Health Live Dashboard")
 st.markdown("---")
 
+# Styles of the battery status indicator, sent once per page load. The live
+# metrics fragment then only sends the status text and its class name.
+STATUS_STYLE = """
+<style>
+.bstat-label {font-size:14px;color:#FFFFFF;margin-bottom:6px;}
+.bstat {font-size:20px;font-weight:600;}
+.bstat.green {color:#16a34a;}
+.bstat.amber {color:#f59e0b;}
+.bstat.red {color:#dc2626;}
+</style>
+"""
+st.markdown(STATUS_STYLE, unsafe_allow_html=True)
+
 # API endpoint configuration (FastAPI backend server)
 API_URL = "http://127.0.0.1:8000"
 
+# Seconds to wait for the backend before treating it as unreachable
+REQUEST_TIMEOUT_S = 5
+
+# Refresh intervals of the page fragments (seconds)
+METRICS_REFRESH_S = 5
+HISTORY_REFRESH_S = 30
+
+# Backend requests that may run at the same time (browser sessions refreshing
+# concurrently): size of the HTTP connection pool, so each of them can keep
+# its own connection alive
+MAX_CONCURRENT_FETCHES = 4
+
+# Maximum number of points drawn per chart; longer histories are downsampled
+CHART_MAX_POINTS = 500
+
+
+@st.cache_resource
+def get_session():
+    """
+    Return the HTTP session shared by all reruns and browser sessions.
+
+    The script is re-executed on every rerun, so the session is kept as a
+    Streamlit resource; its connection pool keeps the TCP connection to the
+    backend alive instead of opening a new one for every request.
+
+    Returns:
+        requests.Session: Shared HTTP session.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1,  # a single host (the backend)
+        pool_maxsize=MAX_CONCURRENT_FETCHES,
+    )
+    session.mount("http://", adapter)
+    return session
+
 
 def fetch_data(endpoint):
     """
     Fetch JSON data from the FastAPI backend.
 
+    Failures are raised instead of returned, so that the cached fetcher
+    (fetch_bundle) never caches an unreachable backend.
+
     Args:
         endpoint (str): The API endpoint path (e.g., 'status/latest', 'history').
 
+    Returns:
+        dict or list: Parsed JSON response data.
+
+    Raises:
+        requests.RequestException: If the backend is unreachable or the
+            response status is not 2xx.
+        orjson.JSONDecodeError: If the response body is not valid JSON.
+    """
+    response = get_session().get(f"{API_URL}/{endpoint}", timeout=REQUEST_TIMEOUT_S)
+    response.raise_for_status()
+    # Parse the raw body bytes with orjson: no text decode step, and much
+    # faster than the standard json module behind response.json()
+    return orjson.loads(response.content)
+
+
+@st.cache_data(ttl=3, show_spinner=False)
+def fetch_bundle():
+    """
+    Dashboard bundle (GET /dashboard/bundle), cached for 3 seconds.
+
+    One request returns everything the page renders: the latest record, its
+    status classification and display values, the RUL forecast and the
+    recent history. Repeated calls within the TTL (e.g., from both fragments)
+    are served from memory. The history is converted into the chart-ready
+    DataFrame inside the cached function, so reruns reuse it instead of
+    rebuilding it from the JSON records.
+
+    Returns:
+        dict: latest, status, forecast, and history as a DataFrame with
+              soh and avg_resistance (float32), indexed by cycle_id.
+    """
+    bundle = fetch_data("dashboard/bundle")
+
+    # The history arrives columnar (one list per field), so each column is
+    # converted straight into a typed array; pandas only wraps the arrays
+    history = bundle["history"]
+    bundle["history"] = pd.DataFrame(
+        {
+            "soh": np.asarray(history["soh"], dtype=np.float32),
+            "avg_resistance": np.asarray(history["avg_resistance"], dtype=np.float32),
+        },
+        index=pd.Index(history["cycle_id"], name="cycle_id"),
+        copy=False,
+    )
+    return bundle
+
+
+def downsample_lttb(series, n_out):
+    """
+    Downsample a chart series with Largest-Triangle-Three-Buckets (LTTB).
+
+    The first and last point are kept; the points in between are split into
+    n_out - 2 equal buckets and from each bucket the point forming the
+    largest triangle with the previously kept point and the average of the
+    next bucket is kept. Peaks and trend changes therefore survive, while the
+    chart only has to serialize and draw n_out points.
+
+    The areas are computed over the row position, not the index: cycle_id
+    restarts with every replay, so it is not monotonic across the history.
+
+    Args:
+        series (pd.Series): Values in chart order (index only used as label).
+        n_out (int): Number of points to keep.
+
+    Returns:
+        pd.Series: The selected points (the series itself if it is short enough).
+    """
+    n = len(series)
+    if n <= n_out or n_out < 3:
+        return series
+
+    # Evenly spaced x (row position); the index (cycle_id) is only the label
+    # of the selected points
+    x = np.arange(n, dtype=np.float64)
+    y = series.to_numpy(dtype=np.float64)
+
+    # Bucket boundaries of the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0  # Index of the previously selected point
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+
+        # Average point of the next bucket (the last point for the final one)
+        next_lo, next_hi = (edges[b + 1], edges[b + 2]) if b < n_out - 3 else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        # Triangle areas (doubled) for all candidates of this bucket at once
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(area.argmax())
+        selected[b + 1] = a
+
+    return series.iloc[selected]
+
+
+def try_fetch(fetch):
+    """
+    Call a cached fetcher, mapping any failure to None.
+
+    Args:
+        fetch (callable): A cached fetcher (e.g., fetch_bundle).
+
     Returns:
         dict or list: Parsed JSON response data if successful, None otherwise.
     """
     try:
-        response = requests.get(f"{API_URL}/{endpoint}")
-        if response.status_code == 200:
-            return response.json()
-    except Exception as e:
+        return fetch()
+    except Exception:
         return None
-    return None
 
 
-# ============ SIDEBAR & STATUS ============
-latest_data = fetch_data("status/latest")
+# ============ SIDEBAR ============
+# Static content, rendered once per page load. Fragments cannot write to the
+# sidebar, so the live connection status is shown above the metrics instead.
+st.sidebar.header("System Status")
+st.sidebar.write(f"Backend: {API_URL}")
+st.sidebar.caption(
+    f"Metrics refresh every {METRICS_REFRESH_S} s, charts every {HISTORY_REFRESH_S} s."
+)
 
 
-if latest_data and "error" not in latest_data:
-    soh = latest_data["soh"]
+@st.fragment(run_every=METRICS_REFRESH_S)
+def live_metrics():
+    """
+    Render the connection status, key metrics, forecast and critical alert.
+
+    Runs as a fragment: Streamlit reruns only this function every
+    METRICS_REFRESH_S seconds, without blocking a thread between refreshes
+    and without re-executing the rest of the page.
+    """
+    # One round trip for the whole page; status and display values are
+    # computed by the backend
+    bundle = try_fetch(fetch_bundle)
 
-    st.sidebar.header("System Status")
-    st.sidebar.success("✓ API Connected")
-    st.sidebar.write(f"Last Update: {latest_data['timestamp']}")
+    if not bundle or bundle["latest"] is None:
+        # Display error if API is unreachable. Ensures the user is aware of connectivity issues.
+        st.error(
+            "❌ Unable to connect to API. Please ensure 'api_server.py' is running on port 8000."
+        )
+        return
+
+    latest_data = bundle["latest"]
+    status = bundle["status"]
+    soh = latest_data["soh"]
+    st.success(f"✓ API Connected · Last Update: {latest_data['timestamp']}")
 
     # ============ KEY METRICS (Top Row) ============
     col1, col2, col3 = st.columns(3)
 
     with col1:
         # State of Health metric with delta showing deviation from reference capacity
-        delta_val = f"{soh - 100:.2f}%"
+        delta_val = f"{status['soh_delta']:.2f}%"
         st.metric(
             label="State of Health (SoH)",
             value=f"{soh:.2f} %",
@@ -84,31 +270,21 @@ if latest_data and "error" not in latest_data:
         )
 
     with col3:
-        # Battery status indicator with explicit, non-overlapping thresholds:
-        # - Healthy: SoH > 90% (green) — Battery performing well, no action needed
-        # - Warning: 80% < SoH <= 90% (amber) — Monitor performance, schedule maintenance soon
+        # Battery status indicator, classified by the backend with explicit,
+        # non-overlapping thresholds (see classify_status() in api_server.py):
+        # - Healthy: SoH >= 90% (green) — Battery performing well, no action needed
+        # - Warning: 80% < SoH < 90% (amber) — Monitor performance, schedule maintenance soon
         # - Maintenance Required: SoH <= 80% (red) — Immediate battery inspection and potential replacement needed
-        if soh >= 90:
-            status_text = "✓ Healthy"
-            color = "#16a34a"  # green
-        elif soh > 80:
-            status_text = "⚠ Warning - Check Soon"
-            color = "#f59e0b"  # amber
-        else:
-            status_text = "🚨 Maintenance Required"
-            color = "#dc2626"  # red
-
-        # Render status indicator with HTML/CSS for color support and custom styling.
+        # Render status indicator with HTML for color support; the styling
+        # comes from the STATUS_STYLE classes defined at the top of the page.
         # This allows visual distinction between status states for quick dashboard interpretation.
-        status_html = f"""
-        <div style="text-align:left;">
-        <div style="font-size:14px;color:#FFFFFF;margin-bottom:6px;">Battery State Indicator</div>
-        <div style="font-size:20px;color:{color};font-weight:600;">{status_text}</div>
-        </div>
-        """
-        st.markdown(status_html, unsafe_allow_html=True)
-
-    forecast = fetch_data("forecast")
+        st.markdown(
+            '<div class="bstat-label">Battery State Indicator</div>'
+            f'<div class="bstat {status["level"]}">{status["text"]}</div>',
+            unsafe_allow_html=True,
+        )
+
+    forecast = bundle["forecast"]
     if forecast and "remaining_cycles" in forecast:
         st.markdown("--- Predictive Maintenance Prognose ---")
 
@@ -121,50 +297,50 @@ if latest_data and "error" not in latest_data:
         with c2:
             st.info(f"Estimated End Cycle: approx. {forecast['estimated_end_cycle']}")
 
-        # small progress bar to visually represent remaining battery life
-        # start at 100% and end at 80%, so we have a 20% range to represent. We can calculate the percentage of that range that has been used.
-        progress = max(
-            0, min(100, (latest_data["soh"] - 80) / 0.2)
-        )  # normalize to 0-100% where 100% is 80% SoH and 0% is 100% SoH
+        # small progress bar to visually represent remaining battery life:
+        # the share of the usable range (100% down to 80% SoH) that remains,
+        # from 1.0 at 100% SoH to 0.0 at 80% SoH
         st.write("Remaining battery life:")
-        st.progress(progress / 100)
+        st.progress(status["life_remaining"])
 
+    # Display critical warning if State of Health drops below 80%.
+    # This serves as an alert to maintenance teams that immediate action is required.
+    if status["critical"]:
+        st.error(
+            f"🚨 CRITICAL ALERT: State of Health has dropped to {soh:.2f}%. Battery inspection required."
+        )
+
+
+@st.fragment(run_every=HISTORY_REFRESH_S)
+def history_charts():
+    """
+    Render the SoH and internal resistance trend charts.
+
+    Runs as a separate fragment on the slower HISTORY_REFRESH_S timer, so the
+    charts are only redrawn when the cached history can have changed, not on
+    every metrics refresh.
+    """
     # ============ CHARTS (Bottom Row) ============
     # Fetch historical battery data and display interactive time-series charts for trend analysis.
-    history_data = fetch_data("history")
-    if history_data:
-        df = pd.DataFrame(history_data)
-
+    bundle = try_fetch(fetch_bundle)
+    df = bundle["history"] if bundle else None
+    if df is not None and not df.empty:
         c1, c2 = st.columns(2)
 
         with c1:
             st.subheader("Capacity Loss (SoH Trend)")
-            st.line_chart(df.set_index("cycle_id")["soh"])
+            st.line_chart(downsample_lttb(df["soh"], CHART_MAX_POINTS))
             st.write(
                 "Shows how the State of Health (SoH) has evolved over discharge cycles. A downward trend indicates degradation."
             )
 
         with c2:
             st.subheader("Internal Resistance Rise")
-            st.area_chart(df.set_index("cycle_id")["avg_resistance"])
+            st.area_chart(downsample_lttb(df["avg_resistance"], CHART_MAX_POINTS))
             st.write(
                 "Shows the average internal resistance over cycles. An increasing trend can indicate worsening battery health."
             )
 
-    # Display critical warning if State of Health drops below 80%.
-    # This serves as an alert to maintenance teams that immediate action is required.
-    if soh <= 80:
-        st.error(
-            f"🚨 CRITICAL ALERT: State of Health has dropped to {soh:.2f}%. Battery inspection required."
-        )
-
-else:
-    # Display error if API is unreachable. Ensures the user is aware of connectivity issues.
-    st.error(
-        "❌ Unable to connect to API. Please ensure 'api_server.py' is running on port 8000."
-    )
 
-# Auto-refresh dashboard every 5 seconds for live updates.
-# This keeps the displayed metrics current without requiring manual page refresh.
-time.sleep(5)
-st.rerun()
+live_metrics()
+history_charts()